@@ -0,0 +1,188 @@
+import json
+from xml.etree.ElementTree import Element
+
+
+class Node:
+    """
+    compact AST node, tokens are kept as plain strings among the children
+    """
+    __slots__ = ('tag', 'children')
+
+    def __init__(self, tag, children):
+        self.tag = tag
+        self.children = children
+
+    def __repr__(self):
+        return "Node({tag}, {children})".format(tag=self.tag, children=self.children)
+
+
+class NodeBuilder:
+    """
+    builds Nodes and drops wrappers that ended up empty
+    """
+
+    def token(self, value):
+        return value
+
+    def node(self, tag, children):
+        if not children:
+            return None
+        return Node(tag, children)
+
+
+class ElementBuilder:
+    """
+    builds the ElementTree the parser used to produce, empty wrappers included
+    """
+
+    def token(self, value):
+        elem = Element("token")
+        elem.text = value
+        return elem
+
+    def node(self, tag, children):
+        elem = Element(tag)
+        elem.extend(children)
+        return elem
+
+
+def to_element(ast):
+    """
+    convert a Node tree into an Element tree, without recursion
+    """
+    if not isinstance(ast, Node):
+        return ElementBuilder().token(ast)
+
+    root = Element(ast.tag)
+    stack = [(root, ast.children)]
+    while stack:
+        parent, children = stack.pop()
+        for child in children:
+            if isinstance(child, Node):
+                elem = Element(child.tag)
+                stack.append((elem, child.children))
+            else:
+                elem = Element("token")
+                elem.text = child
+            parent.append(elem)
+
+    return root
+
+
+# --- [ Streaming ] --- #
+
+def walk(ast):
+    """
+    ('open', tag), ('token', value) and ('close', tag) events of a Node or Element tree in document order,
+    without recursion
+    """
+    stack = [ast]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            yield item
+        elif isinstance(item, Node):
+            yield 'open', item.tag
+            stack.append(('close', item.tag))
+            stack.extend(reversed(item.children))
+        elif isinstance(item, Element):
+            if item.tag == "token" and not len(item):
+                yield 'token', item.text or ""
+                continue
+            yield 'open', item.tag
+            stack.append(('close', item.tag))
+            stack.extend(reversed(item))
+        else:
+            yield 'token', item
+
+
+def escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def write_xml(ast, file, chunk_size=1 << 16):
+    """
+    write the tree to a binary file as the XML tostring(to_element(ast)) gives,
+    in chunks of about chunk_size characters and without building the whole document
+    """
+    parts = []
+    size = 0
+    pending = None
+
+    for event, value in walk(ast):
+        if pending is not None:
+            # a node opened right before is closed right away when it has no children
+            if event == 'close':
+                part = "<{tag} />".format(tag=pending)
+                pending = None
+                parts.append(part)
+                size += len(part)
+                continue
+            parts.append("<{tag}>".format(tag=pending))
+            size += len(pending) + 2
+            pending = None
+
+        if event == 'open':
+            pending = value
+            continue
+
+        if event == 'token':
+            part = "<token>{text}</token>".format(text=escape(value)) if value else "<token />"
+        else:
+            part = "</{tag}>".format(tag=value)
+        parts.append(part)
+        size += len(part)
+
+        if size >= chunk_size:
+            file.write("".join(parts).encode("ascii", "xmlcharrefreplace"))
+            parts = []
+            size = 0
+
+    if pending is not None:
+        parts.append("<{tag} />".format(tag=pending))
+    file.write("".join(parts).encode("ascii", "xmlcharrefreplace"))
+
+
+def write_jsonl(ast, file, chunk_size=1 << 16):
+    """
+    write the tree to a binary file as JSON lines, one event per line:
+        ["open", tag]   a node starts
+        ["token", value]
+        ["close"]       the last open node ends
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    parts = []
+    size = 0
+
+    for event, value in walk(ast):
+        part = '["close"]\n' if event == 'close' else dumps([event, value]) + "\n"
+        parts.append(part)
+        size += len(part)
+
+        if size >= chunk_size:
+            file.write("".join(parts).encode("utf-8"))
+            parts = []
+            size = 0
+
+    file.write("".join(parts).encode("utf-8"))
+
+
+def read_jsonl(file):
+    """
+    the Node tree of a JSON lines file written by write_jsonl
+    """
+    root = []
+    stack = [root]
+    for line in file:
+        if not line.strip():
+            continue
+        event = json.loads(line)
+        if event[0] == 'open':
+            stack.append([])
+            stack[-2].append(Node(event[1], stack[-1]))
+        elif event[0] == 'token':
+            stack[-1].append(event[1])
+        else:
+            stack.pop()
+
+    return root[0] if root else None
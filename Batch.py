@@ -0,0 +1,161 @@
+"""
+parse many pseudocode programs across a process pool:
+
+    python Batch.py PATH [PATH ...] [--out DIR] [--format xml|jsonl] [--workers N] [--pattern *.pseu]
+"""
+import argparse
+import fnmatch
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from AST import write_xml, write_jsonl
+from Parser import Parser, ParseError
+import Grammar
+import Pseudocode
+
+
+# built once per worker by setup
+tokenizer = None
+parser = None
+
+writers = {
+    "xml": write_xml,
+    "jsonl": write_jsonl,
+}
+
+
+class Result:
+    """
+    outcome of one program, error is None when it parsed
+    """
+
+    def __init__(self, name, output=None, tokens=0, error=None):
+        self.name = name
+        self.output = output
+        self.tokens = tokens
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return "Result({name}, error={error!r})".format(name=self.name, error=self.error)
+        return "Result({name}, {tokens} tokens)".format(name=self.name, tokens=self.tokens)
+
+
+def setup(grammar):
+    """
+    pool initializer, the compiled grammar is loaded once per worker
+    """
+    global tokenizer, parser
+    tokenizer = Grammar.load(grammar).tokenizer
+    parser = Parser(grammar)
+
+
+def work(name, source, path, output, output_format="xml"):
+    """
+    tokenize and parse one program inside a worker, the AST goes straight to disk
+    """
+    try:
+        if source is None:
+            tokens = tokenizer.tokenize_file(path)
+        else:
+            tokens = tokenizer.tokenize_stream(source)
+        ast = parser.parse(tokens)
+
+        if output is not None:
+            with open(output, "wb") as file:
+                writers[output_format](ast, file)
+
+        return Result(name, output, len(tokens))
+
+    except (ParseError, RuntimeError, OSError, UnicodeDecodeError) as error:
+        return Result(name, error="{kind}: {error}".format(kind=type(error).__name__, error=error))
+
+
+def jobs(sources, pattern="*.pseu"):
+    """
+    (name, source, path) for a directory, paths or (name, source) pairs
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+
+    for source in sources:
+        if isinstance(source, tuple):
+            name, text = source
+            yield name, text, None
+
+        elif os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for file in sorted(fnmatch.filter(files, pattern)):
+                    path = os.path.join(root, file)
+                    yield os.path.relpath(path, source), None, path
+
+        else:
+            yield os.path.basename(source), None, source
+
+
+def parse_batch(sources, grammar=None, out_dir=None, workers=None, pattern="*.pseu", output_format="xml"):
+    """
+    yield a Result for every program as soon as a worker finishes it
+
+    sources is a directory, a path or an iterable of paths and (name, source) pairs,
+    with out_dir set every AST is written there as <name>.xml or <name>.jsonl by the worker that parsed it,
+    a program whose name another one already writes under is an error and is not parsed
+    """
+    if grammar is None:
+        grammar = Pseudocode.grammar
+
+    # compile and store the grammar before the workers start, they only load it
+    Grammar.load(grammar)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=setup, initargs=(grammar,)) as pool:
+        limit = workers * 4
+        pending = set()
+        written = {}
+
+        for name, source, path in jobs(sources, pattern):
+            output = None
+            if out_dir is not None:
+                output = os.path.join(out_dir, name + "." + output_format)
+                key = os.path.normcase(os.path.abspath(output))
+                if key in written:
+                    yield Result(name, error="FileExistsError: {output} is written for {other} already".format(
+                        output=output, other=written[key]))
+                    continue
+                written[key] = path or name
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+
+            pending.add(pool.submit(work, name, source, path, output, output_format))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    arguments.add_argument("paths", nargs="+", help="program files or directories")
+    arguments.add_argument("--out", help="directory for the ASTs")
+    arguments.add_argument("--format", choices=list(writers), default="xml", help="file format of the ASTs")
+    arguments.add_argument("--workers", type=int, default=None)
+    arguments.add_argument("--pattern", default="*.pseu", help="file pattern inside directories")
+    args = arguments.parse_args(argv)
+
+    failed = 0
+    for result in parse_batch(args.paths, out_dir=args.out, workers=args.workers, pattern=args.pattern,
+                              output_format=args.format):
+        if result.error is None:
+            print(f"ok    {result.name} ({result.tokens} tokens)")
+        else:
+            failed += 1
+            print(f"error {result.name}: {result.error.splitlines()[0]}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
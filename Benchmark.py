@@ -0,0 +1,206 @@
+"""
+tokenizer, parser and serializer benchmarks over generated pseudocode:
+
+    python Benchmark.py [--repeat N] [--output results.json] [--compare old.json] [--expressions flat]
+                        [--profile stacks.txt]
+"""
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from xml.etree.ElementTree import tostring
+
+from Pseudocode import grammar
+from Tokenizer import Tokenizer
+from Parser import Parser
+from AST import NodeBuilder, ElementBuilder, to_element
+
+
+# --- [ Generators ] --- #
+
+def statements(count):
+    """
+    a flat program of assignments, calls, ifs and whiles
+    """
+    templates = [
+        "x{i} ← a{i} * {i} + b − 3;",
+        "print(x{i});",
+        "if x{i} < {i} then y ← y + 1; fi",
+        "while x{i} > 0 then x{i} ← x{i} − 1; done",
+    ]
+    return ["\n".join(templates[i % len(templates)].format(i=i) for i in range(count))]
+
+
+def nesting(depth):
+    """
+    a single assignment with depth nested parentheses
+    """
+    expression = "x"
+    for i in range(depth):
+        expression = f"({expression} + {i}) * 2"
+    return [f"r ← {expression};"]
+
+
+def elif_chain(length):
+    """
+    an if statement with length elif branches
+    """
+    branches = "\n".join(f"elif x < {i} then r ← {i};" for i in range(1, length + 1))
+    return [f"if x < 0 then r ← 0;\n{branches}\nelse r ← 1; fi"]
+
+
+def functions(count):
+    """
+    count programs holding one function each, the grammar allows a single funcdef per program
+    """
+    return [
+        f"FUNCTION f{i}(x, y):\n"
+        f"  while x < {i} then x ← x + 1; done\n"
+        f"  y ← x * 2 − y;\n"
+        f"  RETURN y;"
+        for i in range(count)
+    ]
+
+
+generators = {
+    "statements": (statements, [100, 1000]),
+    "nesting": (nesting, [8, 16, 32]),
+    "elif_chain": (elif_chain, [10, 100]),
+    "functions": (functions, [10, 100]),
+}
+
+
+# --- [ Measurements ] --- #
+
+def measure(run, repeat=5):
+    """
+    best time per call, peak traced memory and garbage collections per call
+    """
+    run()
+
+    timings = []
+    collections = sum(stat["collections"] for stat in gc.get_stats())
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    collections = sum(stat["collections"] for stat in gc.get_stats()) - collections
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time": min(timings),
+        "peak": peak,
+        "collections": collections / repeat,
+    }
+
+
+def bench(sources, tokenizer, parser, repeat=5):
+    """
+    time tokenize, parse and XML serialization of the sources separately
+    """
+    tokens = [tokenizer.tokenize(source) for source in sources]
+    asts = [parser.parse(stream) for stream in tokens]
+    count = sum(map(len, tokens))
+
+    phases = {
+        "tokenize": lambda: [tokenizer.tokenize(source) for source in sources],
+        "parse": lambda: [parser.parse(stream) for stream in tokens],
+        "serialize": lambda: [tostring(to_element(ast)) for ast in asts],
+    }
+
+    result = {"tokens": count, "bytes": sum(map(len, sources))}
+    for phase, run in phases.items():
+        result[phase] = measure(run, repeat)
+        result[phase]["tokens_per_sec"] = count / result[phase]["time"]
+    return result
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- [ Report ] --- #
+
+def report(results, baseline=None):
+    previous = {(result["case"], result["size"]): result for result in (baseline or {}).get("results", [])}
+
+    print(f"{'case':<12}{'size':>6}{'tokens':>8}"
+          f"{'tokenize tok/s':>16}{'parse tok/s':>14}{'serialize tok/s':>17}{'parse peak KiB':>16}"
+          + (f"{'parse vs base':>15}" if previous else ""))
+
+    for result in results:
+        line = (f"{result['case']:<12}{result['size']:>6}{result['tokens']:>8}"
+                f"{result['tokenize']['tokens_per_sec']:>16.0f}"
+                f"{result['parse']['tokens_per_sec']:>14.0f}"
+                f"{result['serialize']['tokens_per_sec']:>17.0f}"
+                f"{result['parse']['peak'] / 1024:>16.1f}")
+
+        old = previous.get((result["case"], result["size"]))
+        if old is not None:
+            line += f"{old['parse']['time'] / result['parse']['time']:>14.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    arguments.add_argument("--repeat", type=int, default=5)
+    arguments.add_argument("--output", default="bench_results.json")
+    arguments.add_argument("--compare", help="results file of an earlier run")
+    arguments.add_argument("--builder", choices=["Node", "Element"], default="Node")
+    arguments.add_argument("--expressions", choices=["rules", "precedence", "flat"], default="rules",
+                           help="what parses the expressions, see Parser.build")
+    arguments.add_argument("--iterative", action="store_true", help="parse on the bytecode machine")
+    arguments.add_argument("--profile", metavar="PATH",
+                           help="count per rule, print the table and write collapsed stacks to PATH")
+    arguments.add_argument("--case", action="append", choices=list(generators),
+                           help="only run these cases, may be repeated")
+    args = arguments.parse_args(argv)
+
+    tokenizer = Tokenizer(grammar)
+    parser = Parser(grammar, builder=NodeBuilder() if args.builder == "Node" else ElementBuilder(),
+                    expressions=args.expressions, iterative=args.iterative, profile=bool(args.profile))
+
+    results = []
+    for case in args.case or generators:
+        generate, sizes = generators[case]
+        for size in sizes:
+            result = bench(generate(size), tokenizer, parser, args.repeat)
+            results.append({"case": case, "size": size, **result})
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+
+    if args.profile:
+        print()
+        print(parser.profile.table())
+        parser.profile.write_collapsed(args.profile)
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "commit": commit(),
+            "python": platform.python_version(),
+            "builder": args.builder,
+            "expressions": args.expressions,
+            "iterative": args.iterative,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, file, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
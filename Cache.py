@@ -0,0 +1,167 @@
+"""
+parse result cache, a program parsed before is looked up by the hash of the grammar and of its source:
+
+    cache = ParseCache(grammar, cache_dir="build/asts")
+    ast = cache.parse(program)
+    cache.stats()
+
+the ASTs are kept pickled, in memory least recently used first out and optionally in cache_dir,
+a hit costs a hash and an unpickle and gives a tree of its own that can be changed freely
+"""
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import Grammar
+import Pseudocode
+from AST import NodeBuilder
+from Parser import Parser
+
+
+# of the pickled trees, see Grammar.VERSION
+VERSION = 1
+
+CACHE_DIR = Grammar.cache_dir("PSEUDOCODE_AST_CACHE")
+
+
+def digest(grammar, program, options=""):
+    source = hashlib.sha256(program.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{VERSION}\n{Grammar.digest(grammar)}\n{options}\n{source}".encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    tokenizes and parses programs it has not seen, the rest comes from memory or cache_dir
+
+    memory holds at most max_bytes of pickled trees and cache_dir at most max_disk_bytes,
+    the least recently used entries are evicted first, a limit of None is no limit
+    """
+
+    def __init__(self, grammar=None, expressions="rules", builder=None,
+                 max_bytes=64 << 20, cache_dir=CACHE_DIR, max_disk_bytes=1 << 30):
+        if grammar is None:
+            grammar = Pseudocode.grammar
+
+        self.grammar = grammar
+        self.builder = builder or NodeBuilder()
+        self.options = "{expressions} {builder}".format(expressions=expressions, builder=type(self.builder).__name__)
+        self.parser = Parser(grammar, builder=self.builder, expressions=expressions)
+        self.tokenizer = Grammar.load(grammar).tokenizer
+
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        # bytes in cache_dir, counted when first written to and again on eviction
+        self.disk_size = None
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def parse(self, program):
+        """
+        the AST of program, a ParseError is raised and nothing is cached when it does not parse
+        """
+        key = digest(self.grammar, program, self.options)
+
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(data)
+
+        data = self.read(key)
+        if data is not None:
+            self.disk_hits += 1
+            self.remember(key, data)
+            return pickle.loads(data)
+
+        self.misses += 1
+        ast = self.parser.parse(self.tokenizer.tokenize_stream(program))
+        try:
+            data = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # a tree nested too deep to pickle is parsed again every time
+            return ast
+
+        self.remember(key, data)
+        self.write(key, data)
+        return ast
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    # --- [ Memory ] --- #
+
+    def remember(self, key, data):
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return
+
+        self.entries[key] = data
+        self.size += len(data)
+        while self.max_bytes is not None and self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    # --- [ Disk ] --- #
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pickle")
+
+    def read(self, key):
+        if not self.cache_dir:
+            return None
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # the modification time orders the entries for eviction, a hit makes one recent again
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def write(self, key, data):
+        if not self.cache_dir:
+            return
+
+        Grammar.save(data, self.path(key))
+        if self.max_disk_bytes is None:
+            return
+
+        if self.disk_size is None:
+            self.evict()
+        else:
+            self.disk_size += len(data)
+            if self.disk_size > self.max_disk_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        remove the entries used longest ago until cache_dir fits in max_disk_bytes
+        """
+        self.disk_size, removed = Grammar.evict(self.cache_dir, self.max_disk_bytes, ".pickle")
+        self.evictions += removed
+
+    def __repr__(self):
+        return "ParseCache({entries} entries, {hits} hits, {misses} misses)".format(
+            entries=len(self.entries), hits=self.hits + self.disk_hits, misses=self.misses)
@@ -1,17 +1,373 @@
 import re
 
+from AST import NodeBuilder
+from Parser import ParseError
+from Tokenizer import Tokenizer, TokenBuffer, EOF
+
+
+# --- [ Instructions ] --- #
+
+EAT = 0
+OPEN = 1
+CLOSE = 2
+CHOICE = 3
+COMMIT = 4
+PARTIAL_COMMIT = 5
+CALL = 6
+RETURN = 7
+END = 8
+
+
+def first_of(expr, first, nullable):
+    """
+    tokens an expression can start with and whether it can match no tokens at all
+    """
+    kind, items = expr[0], expr[1:]
+
+    if kind == 'eat':
+        return {items[0]}, False
+
+    if kind == 'rule':
+        return set(first[items[0]]), items[0] in nullable
+
+    if kind == 'alt':
+        tokens, empty = set(), False
+        for item in items:
+            item_tokens, item_empty = first_of(item, first, nullable)
+            tokens |= item_tokens
+            empty = empty or item_empty
+        return tokens, empty
+
+    tokens, empty = set(), True
+    for item in items:
+        item_tokens, item_empty = first_of(item, first, nullable)
+        tokens |= item_tokens
+        if not item_empty:
+            empty = False
+            break
+
+    return tokens, empty or kind in ('opt', 'star')
+
+
+def first_sets(rules):
+    """
+    FIRST set of every rule and the rules that can match no tokens, iterated to a fixed point
+    """
+    first = {name: set() for name in rules}
+    nullable = set()
+
+    changed = True
+    while changed:
+        changed = False
+        for name, rule in rules.items():
+            tokens, empty = first_of(rule, first, nullable)
+            if not tokens <= first[name] or empty and name not in nullable:
+                first[name] |= tokens
+                if empty:
+                    nullable.add(name)
+                changed = True
+
+    return {name: frozenset(tokens) for name, tokens in first.items()}, frozenset(nullable)
+
+
+# --- [ Bytecode ] --- #
+
+def compile_rules(rules, start, token_kind):
+    """
+    bytecode of a rule table, the program calls start and ends, returns it and the rule entries
+
+    token_kind numbers the tokens as the Tokenizer does, an EAT compares the numbers
+    """
+    program = [(CALL, start), (END, None)]
+    entries = {}
+
+    for name, rule in rules.items():
+        entries[name] = len(program)
+        compile_expr(rule, name, program, token_kind)
+        program.append((RETURN, None))
+
+    program = [(CALL, entries[arg]) if op == CALL else (op, arg) for op, arg in program]
+    return program, entries
+
+
+def compile_expr(expr, tag, program, token_kind):
+    kind, items = expr[0], expr[1:]
+
+    if kind == 'eat':
+        token, = items
+        program.append((EAT, (token_kind(token), token)))
+
+    elif kind == 'rule':
+        name, = items
+        program.append((CALL, name))
+
+    elif kind == 'seq':
+        program.append((OPEN, tag))
+        for item in items:
+            compile_expr(item, tag, program, token_kind)
+        program.append((CLOSE, tag))
+
+    elif kind == 'alt':
+        program.append((OPEN, tag))
+        commits = []
+        for item in items[:-1]:
+            choice = len(program)
+            program.append(None)
+            compile_expr(item, tag, program, token_kind)
+            commits.append(len(program))
+            program.append(None)
+            program[choice] = (CHOICE, len(program))
+        compile_expr(items[-1], tag, program, token_kind)
+        for commit in commits:
+            program[commit] = (COMMIT, len(program))
+        program.append((CLOSE, tag))
+
+    elif kind == 'opt':
+        program.append((OPEN, tag))
+        choice = len(program)
+        program.append(None)
+        for item in items:
+            compile_expr(item, tag, program, token_kind)
+        program.append((COMMIT, len(program) + 1))
+        program[choice] = (CHOICE, len(program))
+        program.append((CLOSE, tag))
+
+    elif kind in ('star', 'plus'):
+        program.append((OPEN, tag))
+        if kind == 'plus':
+            for item in items:
+                compile_expr(item, tag, program, token_kind)
+        loop = len(program)
+        program.append(None)
+        for item in items:
+            compile_expr(item, tag, program, token_kind)
+        program.append((PARTIAL_COMMIT, loop + 1))
+        program[loop] = (CHOICE, len(program))
+        program.append((CLOSE, tag))
+
+    else:
+        raise ValueError(f"Unknown rule kind {kind}")
+
+
+# --- [ Machine ] --- #
+
+def run(program, tokens, builder, cursor=0):
+    """
+    run compiled rules from the cursor with explicit call and backtrack stacks,
+    nesting depth costs list entries and no Python frames
+    """
+    furthest = cursor
+    expected = set()
+
+    root = []
+    nodes = [root]
+    calls = []
+    choices = []
+
+    pc = 0
+    while True:
+        op, arg = program[pc]
+
+        if op == EAT:
+            token = tokens[cursor]
+            if token.kind == arg[0]:
+                nodes[-1].append(builder.token(token.value))
+                cursor += 1
+                pc += 1
+                continue
+
+            # fail: resume at the most recent choice
+            if cursor > furthest:
+                furthest = cursor
+                expected = {arg[1]}
+            elif cursor == furthest:
+                expected.add(arg[1])
+            if not choices:
+                break
+            pc, cursor, depth, children, frames = choices.pop()
+            del nodes[depth:]
+            del nodes[-1][children:]
+            del calls[frames:]
+
+        elif op == OPEN:
+            nodes.append([])
+            pc += 1
+
+        elif op == CLOSE:
+            node = builder.node(arg, nodes.pop())
+            if node is not None:
+                nodes[-1].append(node)
+            pc += 1
+
+        elif op == CHOICE:
+            choices.append((arg, cursor, len(nodes), len(nodes[-1]), len(calls)))
+            pc += 1
+
+        elif op == COMMIT:
+            choices.pop()
+            pc = arg
+
+        elif op == PARTIAL_COMMIT:
+            alternative, start, depth, children, frames = choices[-1]
+            if cursor == start:
+                # a body that matched no tokens would match none forever, the loop ends before it
+                choices.pop()
+                del nodes[-1][children:]
+                pc = alternative
+            else:
+                choices[-1] = (alternative, cursor, depth, len(nodes[-1]), frames)
+                pc = arg
+
+        elif op == CALL:
+            calls.append(pc + 1)
+            pc = arg
+
+        elif op == RETURN:
+            pc = calls.pop()
+
+        elif op == END:
+            # the start rule has to end at EOF, otherwise the furthest failure is the error
+            if tokens[cursor].kind == EOF:
+                return root[0]
+            if cursor > furthest:
+                furthest, expected = cursor, {"EOF"}
+            elif cursor == furthest:
+                expected.add("EOF")
+            break
+
+    raise ParseError(furthest, expected, tokens[furthest])
+
 
 class EBNF:
-    def __init__(self, grammar):
+    """
+    compiles the grammar into a rule table and runs it on a parsing machine
+
+    rule table entries are nested tuples:
+        ('seq', *items)     regex: (...)
+        ('alt', *items)     regex: (a | b | c | ...)
+        ('opt', *items)     regex: (...)?
+        ('star', *items)    regex: (...)*
+        ('plus', *items)    regex: (...)+
+        ('eat', token)      TERMINAL or 'word'
+        ('rule', name)      <anotherRule>
+    """
+
+    symbols = re.compile(r"\s*('[^']+'|\w+|[|()\[\]*+])")
+
+    def __init__(self, grammar, builder=None, tokenizer=None):
+        self.tokenizer = tokenizer if tokenizer is not None else Tokenizer(grammar)
         grammar = grammar.strip().split("\n")
         grammar = list(filter(lambda row: ":" in row, grammar))
         grammar = list(map(lambda row: list(map(str.strip, row.strip().split(":", 1))), grammar))
-        grammar = list(filter(lambda rule: not rule[0].isupper(), grammar))
+        # the first rule is the start rule, the remaining upper case ones are terminals
+        grammar = grammar[:1] + list(filter(lambda rule: not rule[0].isupper(), grammar[1:]))
 
         self.grammar = grammar
+        self.builder = builder if builder is not None else NodeBuilder()
+        self.rules = {}
         self.generate_rules()
 
+        self.start = grammar[0][0]
+        self.program, self.entries = self.compile()
+        self.first, self.nullable = self.first_sets()
+
+    # --- [ Rule table ] --- #
+
     def generate_rules(self):
-        for rule in self.grammar:
-            pass
-            # print(rule)
+        for name, body in self.grammar:
+            symbols = self.scan(name, body)
+            alternatives, end = self.read_alternatives(symbols, 0)
+            if end != len(symbols):
+                raise SyntaxError(f"Unexpected {symbols[end]} in rule {name}: {body}")
+
+            if len(alternatives) == 1:
+                self.rules[name] = ('seq',) + alternatives[0]
+            else:
+                self.rules[name] = ('alt',) + tuple(map(self.join, alternatives))
+
+    def scan(self, name, body):
+        """
+        the symbols of a rule body, text that is not one is a SyntaxError
+        """
+        symbols, pos = [], 0
+        for found in self.symbols.finditer(body):
+            if found.start() != pos:
+                break
+            symbols.append(found.group(1))
+            pos = found.end()
+
+        if body[pos:].strip():
+            raise SyntaxError(f"Unexpected {body[pos:].strip()} in rule {name}: {body}")
+        return symbols
+
+    def read_alternatives(self, symbols, pos):
+        """
+        <option1> | <option2> | ... up to a closing bracket
+        """
+        alternatives = []
+        items, pos = self.read_items(symbols, pos)
+        alternatives.append(items)
+
+        while pos < len(symbols) and symbols[pos] == "|":
+            items, pos = self.read_items(symbols, pos + 1)
+            alternatives.append(items)
+
+        return alternatives, pos
+
+    def read_items(self, symbols, pos):
+        """
+        <item> <item> ... where an item may be repeated with * or +
+        """
+        items = []
+        while pos < len(symbols) and symbols[pos] not in "|)]":
+            symbol = symbols[pos]
+
+            if symbol in "([":
+                closing = ")" if symbol == "(" else "]"
+                alternatives, pos = self.read_alternatives(symbols, pos + 1)
+                if pos == len(symbols) or symbols[pos] != closing:
+                    raise SyntaxError(f"Missing {closing} in {' '.join(symbols)}")
+                group = (alternatives[0]
+                         if len(alternatives) == 1 else
+                         (('alt',) + tuple(map(self.join, alternatives)),))
+
+            elif symbol.startswith("'") or symbol.isupper():
+                group = (('eat', symbol),)
+
+            else:
+                group = (('rule', symbol),)
+
+            pos += 1
+            if symbol == "[":
+                items.append(('opt',) + group)
+            elif pos < len(symbols) and symbols[pos] in "*+":
+                items.append(('star' if symbols[pos] == "*" else 'plus',) + group)
+                pos += 1
+            else:
+                items.append(self.join(group))
+
+        return tuple(items), pos
+
+    @staticmethod
+    def join(items):
+        """
+        a single item stands for itself, more of them make a sequence
+        """
+        return items[0] if len(items) == 1 else ('seq',) + tuple(items)
+
+    def first_sets(self):
+        return first_sets(self.rules)
+
+    # --- [ Bytecode ] --- #
+
+    def compile(self):
+        return compile_rules(self.rules, self.start, self.tokenizer.kind)
+
+    # --- [ Machine ] --- #
+
+    def parse(self, tokens):
+        if not hasattr(tokens, "__getitem__"):
+            tokens = TokenBuffer(tokens)
+
+        cursor = 1 if tokens[0].type == "SOF" else 0
+        return run(self.program, tokens, self.builder, cursor)
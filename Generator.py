@@ -1,19 +1,284 @@
+"""
+Python backend, the AST of a pseudocode program becomes Python source compiled into a code object:
+
+    namespace = Generator().load(program)
+    namespace['funkceG'](3)
+"""
+import hashlib
+import keyword
+import marshal
+import os
+from collections import OrderedDict
+from importlib.util import MAGIC_NUMBER
+
+import Grammar
+import Pseudocode
+from AST import Node
+from Parser import Parser
+
+
+# of the generated source, see Grammar.VERSION
+VERSION = 1
+
+CACHE_DIR = Grammar.cache_dir("PSEUDOCODE_CODE_CACHE", "generated")
+
+operators = {
+    '−': '-',
+    '·': '*',
+    '<>': '!=',
+}
+
+literals = ('None', 'True', 'False')
+
+# how tightly the expression rules bind, the same order as Python's
+levels = {
+    'or_test': 1,
+    'and_test': 2,
+    'not_test': 3,
+    'comparison': 4,
+    'expr': 5,
+    'term': 6,
+    'power': 7,
+}
+
+
+def items(node):
+    """
+    children of node with the wrappers of its own rule spliced in,
+    Either, Optional and the repetitions leave those around the tokens they matched
+    """
+    found = []
+    stack = list(reversed(node.children))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, Node) and child.tag == node.tag:
+            stack.extend(reversed(child.children))
+        else:
+            found.append(child)
+    return found
+
+
+# NAME is ASCII, a Python identifier ending in this prime cannot be one
+PRIME = "\N{MODIFIER LETTER PRIME}"
+
+
+def name(value):
+    """
+    a pseudocode NAME as a Python identifier, Python keywords get a trailing prime,
+    so lambda is lambdaʹ and stays apart from a NAME lambda_
+    """
+    if keyword.iskeyword(value) and value not in literals:
+        return value + PRIME
+    return value
+
+
+def digest(grammar, program, options=""):
+    return hashlib.sha256(
+        f"{VERSION}\n{MAGIC_NUMBER.hex()}\n{grammar}\n{options}\n{program}".encode("utf-8")).hexdigest()
+
+
+# the code objects compiled in this process, least recently used first out
+compiled = OrderedDict()
+
 
 class Generator:
-    def __init__(self):
-        pass
+    """
+    emits Python source for the funcdef, statements and expressions of an AST
+    """
+
+    def __init__(self, grammar=None, expressions="rules", cache_dir=CACHE_DIR, max_entries=256,
+                 max_disk_bytes=64 << 20):
+        if grammar is None:
+            grammar = Pseudocode.grammar
+
+        self.grammar = grammar
+        self.expressions = expressions
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        # bytes in cache_dir, counted when first written to and again on eviction
+        self.disk_size = None
+        # the flat tree has no wrappers around the expression levels, a nested level is a group
+        self.grouped = levels if expressions == "flat" else ()
+
+    # --- [ Code objects ] --- #
+
+    def parse(self, program):
+        tokens = Grammar.load(self.grammar).tokenizer.tokenize_stream(program)
+        return Parser(self.grammar, expressions=self.expressions).parse(tokens)
+
+    def compile(self, program, filename="<pseudocode>"):
+        """
+        the code object of a program, from memory, from cache_dir or generated and stored there
+
+        memory holds at most max_entries code objects and cache_dir at most max_disk_bytes of them,
+        the least recently used are evicted first, a limit of None is no limit
+        """
+        key = digest(self.grammar, program, "{expressions} {filename}".format(
+            expressions=self.expressions, filename=filename))
+        code = compiled.get(key)
+        if code is not None:
+            compiled.move_to_end(key)
+            return code
+
+        path = os.path.join(self.cache_dir, key + ".marshal") if self.cache_dir else None
+
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "rb") as file:
+                    code = marshal.load(file)
+                # the modification time orders the entries for eviction, a hit makes one recent again
+                os.utime(path)
+            except (OSError, EOFError, ValueError, TypeError):
+                code = None
+
+        if code is None:
+            code = compile(self.generate(self.parse(program)), filename, "exec")
+            if path is not None:
+                self.write(code, path)
+
+        compiled[key] = code
+        while self.max_entries is not None and len(compiled) > self.max_entries:
+            compiled.popitem(last=False)
+        return code
+
+    def write(self, code, path):
+        data = marshal.dumps(code)
+        Grammar.save(data, path)
+        if self.max_disk_bytes is None:
+            return
+
+        if self.disk_size is not None:
+            self.disk_size += len(data)
+        if self.disk_size is None or self.disk_size > self.max_disk_bytes:
+            self.disk_size, _ = Grammar.evict(self.cache_dir, self.max_disk_bytes, ".marshal")
+
+    def load(self, program, namespace=None):
+        """
+        run the compiled program in namespace, a funcdef leaves its function there
+        """
+        namespace = {} if namespace is None else namespace
+        exec(self.compile(program), namespace)
+        return namespace
+
+    # --- [ Source ] --- #
 
     def generate(self, ast):
-        if type(ast) is not list:
-            return ast
-        if len(ast) == 2:
-            return self.binOp(ast)
-        if len(ast) == 1:
-            return self.generate(ast[0])
-
-    def binOp(self, ast):
-        assert len(ast) == 2, "ast length != 2"
-        left, right = ast
-
-        print("LEFT", self.generate(left))
-        print("RIGHT", self.generate(right))
+        """
+        Python source of an AST
+        """
+        return "\n".join(self.statements(items(ast), 0)) + "\n"
+
+    def statements(self, nodes, depth):
+        lines = []
+        for node in nodes:
+            if isinstance(node, Node):
+                lines.extend(self.statement(node, depth))
+        return lines
+
+    def statement(self, node, depth):
+        parts = items(node)
+        indent = "    " * depth
+
+        if node.tag in ('stmt', 'compound_stmt'):
+            return self.statement(parts[0], depth)
+
+        if node.tag == 'simple_stmt':
+            if isinstance(parts[0], Node) and parts[0].tag == 'assign':
+                return self.statement(parts[0], depth)
+            return [indent + self.expression(parts[0])]
+
+        if node.tag == 'assign':
+            return [indent + name(parts[0]) + " = " + self.expression(parts[2])]
+
+        if node.tag == 'if_stmt':
+            lines = []
+            position = 0
+            while parts[position] != 'fi':
+                if parts[position] == 'else':
+                    lines.append(indent + "else:")
+                    position += 1
+                else:
+                    lines.append(indent + "{keyword} {test}:".format(
+                        keyword=parts[position], test=self.expression(parts[position + 1])))
+                    position += 3
+                lines.extend(self.suite(parts[position], depth + 1))
+                position += 1
+            return lines
+
+        if node.tag == 'while_stmt':
+            return ([indent + "while {test}:".format(test=self.expression(parts[1]))]
+                    + self.suite(parts[3], depth + 1))
+
+        if node.tag == 'funcdef':
+            header = "def {name}({parameters}):".format(name=name(parts[1]), parameters=self.parameters(parts[2]))
+            return ([indent + header]
+                    + self.suite(parts[4], depth + 1)
+                    + self.statement(parts[5], depth + 1))
+
+        if node.tag == 'return_stmt':
+            value = parts[1] if len(parts) == 3 else None
+            return [indent + "return" + ("" if value is None else " " + self.expression(value))]
+
+        raise ValueError(f"Cannot generate a statement from {node.tag}")
+
+    def suite(self, node, depth):
+        return self.statements(items(node), depth)
+
+    def parameters(self, clause):
+        names = []
+        for parameters in items(clause)[1:-1]:
+            for parameter in items(parameters)[::2]:
+                names.append(name(items(parameter)[0]))
+        return ", ".join(names)
+
+    def expression(self, item):
+        if not isinstance(item, Node):
+            return self.atom(item)
+
+        parts = self.parts(item)
+
+        if item.tag == 'call':
+            # the flat tree leaves the parentheses out
+            argument = parts[2] if parts[1] == '(' else parts[1]
+            return "{name}({argument})".format(name=name(parts[0]), argument=self.expression(argument))
+
+        if item.tag == 'factor' and parts[0] == '(':
+            return "(" + self.expression(parts[1]) + ")"
+
+        level = levels.get(item.tag)
+        if item.tag == 'not_test' and parts[0] == 'not':
+            negations = parts.count('not')
+            return "not " * negations + self.operand(parts[negations], level, True)
+
+        # operands and the operators between them
+        code = [self.operand(parts[0], level, True)]
+        for operator, operand in zip(parts[1::2], parts[2::2]):
+            code.append(operators.get(operator, operator))
+            code.append(self.operand(operand, level, False))
+        return " ".join(code)
+
+    def operand(self, item, level, first):
+        """
+        an operand in parentheses when it binds looser than its operator,
+        the flat tree has no parentheses of its own and Python would chain nested comparisons
+        """
+        code = self.expression(item)
+        inner = levels.get(item.tag) if isinstance(item, Node) and len(self.parts(item)) > 1 else None
+        if inner is not None and level is not None and (
+                inner < level or inner == level and (not first or item.tag == 'comparison')):
+            return "(" + code + ")"
+        return code
+
+    def parts(self, item):
+        if item.tag in self.grouped:
+            return item.children
+        return items(item)
+
+    def atom(self, value):
+        if value[0] in "\"'":
+            return repr(value[1:-1])
+        if value[0].isdigit() or value[0] == ".":
+            # the value as the Interpreter reads it, Python would reject 007
+            return repr(float(value) if "." in value else int(value))
+        return name(value)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import pickle
+
+from EBNF import EBNF
+from Tokenizer import Tokenizer
+
+
+# bump when the pickled classes change shape, older artifacts are then ignored
+VERSION = 4
+
+
+def cache_dir(variable, name=None):
+    """
+    the cache directory set in the environment variable, the one called name in __pycache__ otherwise,
+    None for no cache when there is no name
+    """
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", name) if name else None
+    return os.environ.get(variable, default)
+
+
+CACHE_DIR = cache_dir("PSEUDOCODE_CACHE", "grammar")
+
+
+class CompiledGrammar:
+    """
+    everything derived from the grammar text, picklable:
+        tokenizer   the token pattern, keywords and terminals, token kinds
+        ebnf        the rule table, its bytecode and the FIRST sets
+    """
+
+    def __init__(self, grammar):
+        self.source = grammar
+        self.digest = digest(grammar)
+        self.tokenizer = Tokenizer(grammar)
+        self.ebnf = EBNF(grammar, tokenizer=self.tokenizer)
+
+    @property
+    def keywords(self):
+        return self.tokenizer.keywords
+
+    @property
+    def rules(self):
+        return self.ebnf.rules
+
+    @property
+    def first(self):
+        return self.ebnf.first
+
+    def __repr__(self):
+        return "CompiledGrammar({digest})".format(digest=self.digest[:12])
+
+
+def digest(grammar):
+    return hashlib.sha256(f"{VERSION}\n{grammar}".encode("utf-8")).hexdigest()
+
+
+loaded = {}
+
+
+def load(grammar, cache_dir=CACHE_DIR):
+    """
+    the compiled grammar for the text, from memory, from cache_dir or compiled and stored there
+    """
+    key = digest(grammar)
+    if key in loaded:
+        return loaded[key]
+
+    path = os.path.join(cache_dir, key + ".pickle") if cache_dir else None
+    compiled = None
+
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, "rb") as file:
+                compiled = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+            compiled = None
+
+    if compiled is None or compiled.source != grammar:
+        compiled = CompiledGrammar(grammar)
+        if path is not None:
+            save(pickle.dumps(compiled, protocol=pickle.HIGHEST_PROTOCOL), path)
+
+    loaded[key] = compiled
+    return compiled
+
+
+def save(data, path):
+    """
+    write the bytes of a cache entry atomically, a cache that cannot be written is skipped
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = "{path}.{pid}".format(path=path, pid=os.getpid())
+        with open(partial, "wb") as file:
+            file.write(data)
+        os.replace(partial, path)
+    except OSError:
+        pass
+
+
+def evict(directory, limit, suffix):
+    """
+    remove the files ending in suffix used longest ago until directory holds at most limit bytes of them,
+    returns the bytes left and how many files were removed
+    """
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(suffix):
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+    total, removed = sum(size for _, size, _ in entries), 0
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    return total, removed
@@ -0,0 +1,621 @@
+"""
+incremental reparsing of a program edited in place:
+
+    document = Document(grammar, text)
+    ast = document.edit(offset, deleted, inserted)
+
+an edit relexes the tokens from the one before it until the old tokens line up again,
+then reparses the statements around the changed tokens in the innermost statement list
+holding them, the rest of the tree is kept as it is
+
+nothing after the edit is copied or renumbered, the text is kept in pieces, the tokens in a gap buffer,
+and the piece starts, the token offsets and the statement spans past it are stored short
+by what the edits before took or gave and are made whole as later edits move past them,
+so an edit costs what it changed and how far it is from the one before
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+import Grammar
+from AST import Node
+from Parser import Parser, ParseError, Failure
+from Tokenizer import Token, TokenStream, SOF, EOF
+
+
+# characters a token's match may look past its end, a window of the text is lexed this far short of its end
+LOOKAHEAD = 64
+
+
+class Text:
+    """
+    a string kept in pieces of about size characters, so an edit copies the pieces it touches only,
+    the starts of the pieces from piece gap on are stored shift characters short
+    """
+    __slots__ = ('pieces', 'starts', 'size', 'gap', 'shift')
+
+    def __init__(self, text, size=1 << 12):
+        self.pieces = [text[start:start + size] for start in range(0, len(text), size)] or [""]
+        self.starts = array('i', range(0, len(self.pieces) * size, size))
+        self.size = size
+        self.gap = 0
+        self.shift = 0
+
+    def start(self, index):
+        return self.starts[index] + (self.shift if index >= self.gap else 0)
+
+    def locate(self, offset):
+        """
+        index of the last piece starting at or before offset
+        """
+        starts, gap = self.starts, self.gap
+        if gap < len(starts) and starts[gap] + self.shift <= offset:
+            return bisect_right(starts, offset - self.shift, gap) - 1
+        return max(0, bisect_right(starts, offset, 0, gap) - 1)
+
+    def move(self, gap):
+        """
+        put the gap before piece gap, the starts it passes over are stored whole or short again
+        """
+        starts, shift = self.starts, self.shift
+        for index in range(gap, self.gap):
+            starts[index] -= shift
+        for index in range(self.gap, gap):
+            starts[index] += shift
+        self.gap = gap
+
+    def replace(self, offset, deleted, inserted):
+        """
+        replace deleted characters at offset with inserted, the pieces after them move by the difference
+        """
+        first, last = self.locate(offset), self.locate(offset + deleted) + 1
+        base = self.start(first)
+        text = "".join(self.pieces[first:last])
+        text = text[:offset - base] + inserted + text[offset + deleted - base:]
+
+        size = self.size
+        pieces = [text[start:start + size] for start in range(0, len(text), size)]
+        if not pieces and last - first == len(self.pieces):
+            pieces = [""]
+        self.move(last)
+        self.pieces[first:last] = pieces
+        self.starts[first:last] = array('i', range(base, base + len(pieces) * size, size))
+        self.gap = first + len(pieces)
+        self.shift += len(inserted) - deleted
+
+    def __len__(self):
+        last = len(self.pieces) - 1
+        return self.start(last) + len(self.pieces[last])
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(len(self))
+        index = self.locate(start)
+        offset = self.start(index)
+        piece = self.pieces[index]
+        if stop - offset <= len(piece):
+            return piece[start - offset:stop - offset]
+
+        parts = [piece[start - offset:]]
+        offset += len(piece)
+        while offset < stop:
+            index += 1
+            piece = self.pieces[index]
+            parts.append(piece[:stop - offset])
+            offset += len(piece)
+        return "".join(parts)
+
+    def __str__(self):
+        return "".join(self.pieces)
+
+    def __repr__(self):
+        return "Text({pieces} pieces)".format(pieces=len(self.pieces))
+
+
+class EditStream(TokenStream):
+    """
+    a TokenStream over a Text edited in place, its arrays are a gap buffer,
+    room free slots sit before token gap and the offsets from token gap on are stored shift characters short
+
+    the first free slot is an EOF, so a parser reaching the gap stops there
+    """
+
+    def __init__(self, stream, source):
+        super().__init__(source, stream.names, stream.encoding)
+        self.kinds, self.starts, self.ends = stream.kinds, stream.starts, stream.ends
+        self.gap = len(self.kinds)
+        self.room = 0
+        self.shift = 0
+
+    def kind(self, index):
+        return self.kinds[index if index < self.gap else index + self.room]
+
+    def start(self, index):
+        if index < self.gap:
+            return self.starts[index]
+        return self.starts[index + self.room] + self.shift
+
+    def end(self, index):
+        if index < self.gap:
+            return self.ends[index]
+        return self.ends[index + self.room] + self.shift
+
+    def value_at(self, index):
+        kind = self.kind(index)
+        if kind == SOF:
+            return "SOF"
+        if kind == EOF:
+            return None
+        return self.source[self.start(index):self.end(index)]
+
+    def find(self, offset, ends=False, low=0, high=None):
+        """
+        index of the first token starting at or after offset, ending with ends, among tokens [low, high)
+        """
+        offsets = self.ends if ends else self.starts
+        high = len(self) if high is None else high
+        # the stored offsets are in order on either side of the gap
+        gap, room = min(max(self.gap, low), high), self.room
+        if gap > low and offsets[gap - 1] >= offset:
+            return bisect_left(offsets, offset, low, gap)
+        return bisect_left(offsets, offset - self.shift, gap + room, high + room) - room
+
+    def move(self, gap):
+        """
+        put the gap before token gap, the tokens it passes over are moved across the free slots
+        and their offsets stored whole or short again
+        """
+        kinds, starts, ends, room, shift = self.kinds, self.starts, self.ends, self.room, self.shift
+        if gap < self.gap:
+            low, high, shift = gap, self.gap, -shift
+            kinds[low + room:high + room] = kinds[low:high]
+            starts[low + room:high + room] = starts[low:high]
+            ends[low + room:high + room] = ends[low:high]
+            moved = range(low + room, high + room)
+        else:
+            low, high = self.gap, gap
+            kinds[low:high] = kinds[low + room:high + room]
+            starts[low:high] = starts[low + room:high + room]
+            ends[low:high] = ends[low + room:high + room]
+            moved = range(low, high)
+        for index in moved:
+            starts[index] += shift
+            ends[index] += shift
+        self.gap = gap
+        if room:
+            kinds[gap] = EOF
+
+    def splice(self, first, last, kinds, starts, ends, shift):
+        """
+        replace tokens [first, last) with the new ones, the tokens after them move by shift characters,
+        the free slots run out only when the tokens grow by an eighth
+        """
+        self.move(last)
+        self.gap, self.room = first, self.room + last - first
+        if len(kinds) > self.room:
+            grow = len(kinds) + len(self.kinds) // 8
+            self.kinds[first:first] = array('i', [EOF]) * grow
+            self.starts[first:first] = array('i', [0]) * grow
+            self.ends[first:first] = array('i', [0]) * grow
+            self.room += grow
+
+        self.kinds[first:first + len(kinds)] = kinds
+        self.starts[first:first + len(kinds)] = starts
+        self.ends[first:first + len(kinds)] = ends
+        self.gap += len(kinds)
+        self.room -= len(kinds)
+        self.shift += shift
+        if self.room:
+            self.kinds[self.gap] = EOF
+
+    def __len__(self):
+        return len(self.kinds) - self.room
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return Token(self.type_at(index), self.value_at(index), self.kind(index))
+
+    def type_at(self, index):
+        return self.names[self.kind(index)]
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+
+class Spans:
+    """
+    the body of the stmt rule, notes where every statement it parses starts and ends
+    """
+    __slots__ = ('body',)
+
+    def __init__(self, body):
+        self.body = body
+
+    def __call__(self, parser):
+        start = parser.cursor
+        result = self.body(parser)
+        if not isinstance(result, Failure):
+            parser.spans[id(result.value)] = (start, parser.cursor, result.value)
+        return result
+
+    def bind(self, name):
+        pass
+
+    def table(self):
+        return self.body.table()
+
+    def prune(self, first, nullable, kind):
+        pass
+
+    def __repr__(self):
+        return "Spans({body})".format(body=self.body)
+
+
+class StatementParser(Parser):
+    """
+    a Parser that keeps the token span of every statement it parsed
+    """
+
+    def __init__(self, grammar, **options):
+        super().__init__(grammar, **options)
+        self.spans = {}
+
+    @classmethod
+    def build(cls, grammar, expressions="rules", profiled=False):
+        rules = super().build(grammar, expressions, profiled)
+        if not isinstance(rules['stmt'].body, Spans):
+            rules['stmt'].body = Spans(rules['stmt'].body)
+        return rules
+
+    def parse(self, tokens, debug=False):
+        self.spans = {}
+        return super().parse(tokens, debug)
+
+
+class Statement:
+    """
+    a stmt node of the tree, its tokens counted from where the statement list holding it starts
+    and the statement lists in it
+    """
+    __slots__ = ('start', 'end', 'node', 'blocks')
+
+    def __init__(self, start, end, node):
+        self.start = start
+        self.end = end
+        self.node = node
+        self.blocks = []
+
+    def __repr__(self):
+        return "Statement({start}, {end})".format(start=self.start, end=self.end)
+
+
+class Block:
+    """
+    the children of a stmt+ node and their Statements,
+    counted from offset tokens after the start of the statement holding it, or from the first token at the top
+
+    the spans from statement gap on are stored shift tokens short
+    """
+    __slots__ = ('children', 'statements', 'suite', 'offset', 'gap', 'shift')
+
+    def __init__(self, children, suite):
+        self.children = children
+        self.statements = []
+        # the first statement of a suite has to stay compound or the suite would be a simple_stmt
+        self.suite = suite
+        self.offset = 0
+        self.gap = 0
+        self.shift = 0
+
+    def span(self, index):
+        statement = self.statements[index]
+        shift = self.shift if index >= self.gap else 0
+        return statement.start + shift, statement.end + shift
+
+    def find(self, position):
+        """
+        index of the last statement starting at or before position, -1 when none does
+        """
+        low, high = 0, len(self.statements)
+        while low < high:
+            middle = (low + high) // 2
+            if self.span(middle)[0] <= position:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def move(self, gap):
+        """
+        put the gap before statement gap, the spans it passes over are stored whole or short again
+        """
+        shift = self.shift
+        for statement in self.statements[gap:self.gap]:
+            statement.start -= shift
+            statement.end -= shift
+        for statement in self.statements[self.gap:gap]:
+            statement.start += shift
+            statement.end += shift
+        self.gap = gap
+
+    def splice(self, begin, last, statements, shift):
+        """
+        replace statements [begin, last) with the new ones, the statements after them move by shift tokens
+        """
+        self.move(last)
+        self.statements[begin:last] = statements
+        self.gap = begin + len(statements)
+        self.shift += shift
+
+
+class Document:
+    """
+    a program kept tokenized and parsed across edits
+
+    a statement ends with ';', 'fi' or 'done', so its tree depends on its own tokens only
+    and a run of statements can be swapped for the statements reparsed from the same tokens
+
+    a text that does not lex or parse is kept too, its ast is None and error says why,
+    size is the length of the pieces the text is kept in
+    """
+
+    def __init__(self, grammar, text, expressions="rules", size=1 << 12):
+        self.tokenizer = Grammar.load(grammar).tokenizer
+        self.parser = StatementParser(grammar, expressions=expressions)
+        self.source = Text(text, size)
+        self.tokens = None
+        self.ast = None
+        self.error = None
+        self.blocks = []
+        self.reparsed = 0
+        self.refresh()
+
+    @property
+    def text(self):
+        return str(self.source)
+
+    def refresh(self):
+        """
+        parse the whole text, tokenized again unless its tokens are up to date,
+        returns the AST or None when the text does not parse
+        """
+        self.ast = None
+        self.blocks = []
+        self.error = None
+        try:
+            if self.tokens is None:
+                self.tokens = EditStream(self.tokenizer.tokenize_stream(str(self.source)), self.source)
+            # a whole parse reads every token, the free slots go after them
+            self.tokens.move(len(self.tokens))
+            self.reparsed = len(self.tokens)
+            self.ast = self.parser.parse(self.tokens)
+        except (RuntimeError, ParseError) as error:
+            self.error = error
+            return None
+
+        _, self.blocks = self.index([self.ast], 0)
+        return self.ast
+
+    def edit(self, offset, deleted, inserted):
+        """
+        replace deleted characters at offset with inserted, returns the new AST or None when it does not parse
+
+        after a lexing or parse error the next edit parses the whole text
+        """
+        old = self.tokens
+        self.source.replace(offset, deleted, inserted)
+        if old is None:
+            return self.refresh()
+
+        try:
+            first, old_end, new_end = self.relex(old, offset, deleted, inserted)
+        except RuntimeError as error:
+            self.tokens = self.ast = None
+            self.blocks = []
+            self.error = error
+            return None
+
+        if self.ast is None or not self.reparse(first, old_end, new_end):
+            return self.refresh()
+        return self.ast
+
+    # --- [ Tokens ] --- #
+
+    def relex(self, old, offset, deleted, inserted):
+        """
+        relex around the edit until a token starts where an old one did,
+        returns the old token range [first, old_end) that became [first, new_end)
+        """
+        shift = len(inserted) - deleted
+        resume = offset + len(inserted)
+
+        # a token's match may have looked a character past its end, the one before the edit is relexed too
+        first = max(1, old.find(offset, ends=True) - 1)
+        begin = min(old.start(first), offset)
+
+        length = resume - begin + self.source.size
+        lexed = self.lex(old, first, begin, length, resume, shift)
+        while lexed is None:
+            length *= 2
+            lexed = self.lex(old, first, begin, length, resume, shift)
+        kinds, starts, ends, old_end = lexed
+
+        # tokens that came out the same are no change
+        while kinds and first < old_end and ends[0] <= offset and (
+                kinds[0], starts[0], ends[0]) == (old.kind(first), old.start(first), old.end(first)):
+            del kinds[0], starts[0], ends[0]
+            first += 1
+
+        while kinds and first < old_end and old.start(old_end - 1) >= offset + deleted and (
+                kinds[-1], starts[-1] - shift, ends[-1] - shift) == (
+                old.kind(old_end - 1), old.start(old_end - 1), old.end(old_end - 1)):
+            del kinds[-1], starts[-1], ends[-1]
+            old_end -= 1
+
+        old.splice(first, old_end, kinds, starts, ends, shift)
+        return first, old_end, first + len(kinds)
+
+    def lex(self, old, first, begin, length, resume, shift):
+        """
+        the tokens from begin until one starts at resume or later where an old token did and that old token,
+        None when they do not end length characters after begin
+        """
+        source = self.source
+        before = min(begin, 1)
+        # the character before begin is lexed with the window for a match looking behind its start
+        code = source[begin - before:begin + length]
+        whole = begin + length >= len(source)
+        limit = len(code) if whole else len(code) - LOOKAHEAD
+        last = len(old) - 1
+
+        kinds, starts, ends = array('i'), array('i'), array('i')
+        try:
+            for kind, start, end in self.tokenizer.spans(code, before):
+                if end > limit:
+                    return None
+                start += begin - before
+                if start >= resume:
+                    # the text from here on is the old one, so are the tokens
+                    index = old.find(start - shift, low=first, high=last)
+                    if old.start(index) == start - shift:
+                        return kinds, starts, ends, index
+                kinds.append(kind)
+                starts.append(start)
+                ends.append(end + begin - before)
+        except RuntimeError:
+            if not whole:
+                return None
+            raise
+        return (kinds, starts, ends, last) if whole else None
+
+    # --- [ Statements ] --- #
+
+    def index(self, nodes, base):
+        """
+        Statements of the stmt nodes among nodes, counted from base, and the statement lists below them,
+        returns those Statements and the statement lists no statement holds
+        """
+        spans = self.parser.spans
+        found, blocks = [], []
+
+        stack = [(node, None, base, found) for node in reversed(nodes)]
+        while stack:
+            node, owner, base, statements = stack.pop()
+            if not isinstance(node, Node):
+                continue
+
+            span = spans.get(id(node))
+            if span is not None and span[2] is node:
+                owner = Statement(span[0] - base, span[1] - base, node)
+                statements.append(owner)
+                base = span[0]
+
+            if any(id(child) in spans for child in node.children if isinstance(child, Node)):
+                block = Block(node.children, node.tag == 'suite')
+                (owner.blocks if owner is not None else blocks).append(block)
+                statements = block.statements
+            stack.extend((child, owner, base, statements) for child in reversed(node.children))
+
+        return found, blocks
+
+    def path(self, first, old_end):
+        """
+        (block, base, index) of every statement list holding the changed tokens, the outermost first,
+        its spans count from base and the next list is in its statement at index
+        """
+        path = []
+        blocks, start = self.blocks, 0
+        while True:
+            for block in blocks:
+                base = start + block.offset
+                count = len(block.statements)
+                if count and base + block.span(0)[0] <= first and old_end <= base + block.span(count - 1)[1]:
+                    break
+            else:
+                return path
+
+            index = block.find(first - base)
+            path.append((block, base, index))
+            blocks, start = block.statements[index].blocks, base + block.span(index)[0]
+
+    def reparse(self, first, old_end, new_end):
+        """
+        reparse the changed tokens in the innermost statement list holding them,
+        False when none could take the change
+        """
+        path = self.path(first, old_end)
+        for depth in reversed(range(len(path))):
+            block, base, _ = path[depth]
+            if self.run(block, base, first, old_end, new_end):
+                self.widen(path[:depth], block, new_end - old_end)
+                return True
+        return False
+
+    def run(self, block, base, first, old_end, new_end):
+        """
+        parse statements from the last one starting before the change
+        until one ends where an old statement ended after it
+        """
+        count = len(block.statements)
+        shift = new_end - old_end
+        begin = last = block.find(first - base)
+        start = base + block.span(begin)[0]
+
+        # the parser stops at the free slots, they go after the statement the change ends in
+        tokens = self.tokens
+        end = base + block.span(max(begin, block.find(old_end - 1 - base)))[1]
+        end = min(len(tokens), max(new_end, end + shift) + 1)
+        if tokens.gap < end:
+            tokens.move(end)
+
+        parser = self.parser
+        parser.spans = {}
+        parser.reset(tokens, start)
+
+        nodes = []
+        while True:
+            cursor = parser.cursor
+            if cursor >= new_end:
+                while last < count and base + block.span(last)[1] < cursor - shift:
+                    last += 1
+                if last == count:
+                    return False
+                if base + block.span(last)[1] == cursor - shift:
+                    break
+
+            result = parser.stmt()
+            if isinstance(result, Failure):
+                if parser.furthest < tokens.gap or tokens.gap == len(tokens):
+                    return False
+                # the statements go on past the free slots, they are moved twice as far
+                tokens.move(min(len(tokens), 2 * tokens.gap - start + 1))
+                return self.run(block, base, first, old_end, new_end)
+            nodes.append(result.value)
+
+        if begin == 0:
+            following = block.statements[last + 1].node if last + 1 < count else None
+            leading = nodes[0] if nodes else following
+            if leading is None:
+                return False
+            if block.suite and leading.children[0].tag != 'compound_stmt':
+                return False
+
+        new, _ = self.index(nodes, base)
+        block.splice(begin, last + 1, new, shift)
+        block.children[begin:last + 1] = nodes
+
+        self.reparsed = parser.cursor - start
+        return True
+
+    def widen(self, path, inner, shift):
+        """
+        the statements holding the statement list inner end shift tokens later,
+        the lists and statements after them start that much later
+        """
+        for block, _, index in reversed(path):
+            owner = block.statements[index]
+            owner.end += shift
+            for later in owner.blocks[owner.blocks.index(inner) + 1:]:
+                later.offset += shift
+            block.move(index + 1)
+            block.shift += shift
+            inner = block
@@ -0,0 +1,566 @@
+"""
+tree-walking interpreter, a resolve pass turns the AST into nodes that run on a frame list:
+
+    namespace = Interpreter().load(program)
+    namespace['funkceG'](3)
+
+variables become slots of the frame, operators the functions of the operator module
+and expressions of constants are folded, running the tree looks at no tag and no name
+"""
+import builtins
+import operator
+
+import Grammar
+import Pseudocode
+from AST import Node
+from Generator import items, levels
+from Parser import Parser
+
+
+operators = {
+    '+': operator.add,
+    '-': operator.sub,
+    '−': operator.sub,
+    '*': operator.mul,
+    '·': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '**': operator.pow,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '<>': operator.ne,
+    '!=': operator.ne,
+}
+
+literals = {
+    'None': None,
+    'True': True,
+    'False': False,
+}
+
+# the largest int, in bits, and the longest str a fold may build, as CPython's optimizer has them
+MAX_INT_SIZE = 128
+MAX_STR_SIZE = 4096
+
+
+class Unset:
+    """
+    the value of a slot nothing was assigned to yet
+    """
+
+    def __repr__(self):
+        return "unset"
+
+
+unset = Unset()
+
+
+# --- [ Expressions ] --- #
+
+class Constant:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, frame):
+        return self.value
+
+    def __repr__(self):
+        return "Constant({value!r})".format(value=self.value)
+
+
+class Load:
+    __slots__ = ('slot', 'name')
+
+    def __init__(self, slot, name):
+        self.slot = slot
+        self.name = name
+
+    def __call__(self, frame):
+        value = frame[self.slot]
+        if value is unset:
+            raise NameError(f"name '{self.name}' is not defined")
+        return value
+
+    def __repr__(self):
+        return "Load({slot}, {name})".format(slot=self.slot, name=self.name)
+
+
+class Global:
+    """
+    a name a funcdef reads but never assigns, looked up in the namespace it was loaded in when it runs
+    """
+    __slots__ = ('namespace', 'name')
+
+    def __init__(self, namespace, name):
+        self.namespace = namespace
+        self.name = name
+
+    def __call__(self, frame):
+        try:
+            return self.namespace[self.name]
+        except KeyError:
+            raise NameError(f"name '{self.name}' is not defined") from None
+
+    def __repr__(self):
+        return "Global({name})".format(name=self.name)
+
+
+class Binary:
+    __slots__ = ('operator', 'left', 'right')
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def __call__(self, frame):
+        return self.operator(self.left(frame), self.right(frame))
+
+    def __repr__(self):
+        return "Binary({operator}, {left}, {right})".format(
+            operator=self.operator.__name__, left=self.left, right=self.right)
+
+
+class Compare:
+    """
+    a chain of comparisons, a < b < c holds when both a < b and b < c do
+    """
+    __slots__ = ('operators', 'operands')
+
+    def __init__(self, operators, operands):
+        self.operators = operators
+        self.operands = operands
+
+    def __call__(self, frame):
+        left = self.operands[0](frame)
+        for compare, operand in zip(self.operators, self.operands[1:]):
+            right = operand(frame)
+            if not compare(left, right):
+                return False
+            left = right
+        return True
+
+    def __repr__(self):
+        return "Compare({operators}, {operands})".format(
+            operators=[compare.__name__ for compare in self.operators], operands=self.operands)
+
+
+class And:
+    __slots__ = ('operands',)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def __call__(self, frame):
+        for operand in self.operands:
+            value = operand(frame)
+            if not value:
+                return value
+        return value
+
+    def __repr__(self):
+        return "And({operands})".format(operands=self.operands)
+
+
+class Or:
+    __slots__ = ('operands',)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def __call__(self, frame):
+        for operand in self.operands:
+            value = operand(frame)
+            if value:
+                return value
+        return value
+
+    def __repr__(self):
+        return "Or({operands})".format(operands=self.operands)
+
+
+class Not:
+    __slots__ = ('operand',)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __call__(self, frame):
+        return not self.operand(frame)
+
+    def __repr__(self):
+        return "Not({operand})".format(operand=self.operand)
+
+
+class Call:
+    __slots__ = ('function', 'argument', 'name')
+
+    def __init__(self, function, argument, name):
+        self.function = function
+        self.argument = argument
+        self.name = name
+
+    def __call__(self, frame):
+        return self.function(self.argument(frame))
+
+    def __repr__(self):
+        return "Call({name}, {argument})".format(name=self.name, argument=self.argument)
+
+
+# --- [ Statements ] --- #
+
+class Assign:
+    __slots__ = ('slot', 'value')
+
+    def __init__(self, slot, value):
+        self.slot = slot
+        self.value = value
+
+    def __call__(self, frame):
+        frame[self.slot] = self.value(frame)
+
+    def __repr__(self):
+        return "Assign({slot}, {value})".format(slot=self.slot, value=self.value)
+
+
+class Block:
+    __slots__ = ('statements',)
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __call__(self, frame):
+        for statement in self.statements:
+            statement(frame)
+
+    def __repr__(self):
+        return "Block({statements})".format(statements=self.statements)
+
+
+class If:
+    """
+    the body of the first branch whose test holds, otherwise the else body if there is one
+    """
+    __slots__ = ('branches', 'otherwise')
+
+    def __init__(self, branches, otherwise):
+        self.branches = branches
+        self.otherwise = otherwise
+
+    def __call__(self, frame):
+        for test, body in self.branches:
+            if test(frame):
+                return body(frame)
+        if self.otherwise is not None:
+            self.otherwise(frame)
+
+    def __repr__(self):
+        return "If({branches}, {otherwise})".format(branches=self.branches, otherwise=self.otherwise)
+
+
+class While:
+    __slots__ = ('test', 'body')
+
+    def __init__(self, test, body):
+        self.test = test
+        self.body = body
+
+    def __call__(self, frame):
+        test, body = self.test, self.body
+        while test(frame):
+            body(frame)
+
+    def __repr__(self):
+        return "While({test}, {body})".format(test=self.test, body=self.body)
+
+
+class Function:
+    """
+    a funcdef, every call runs the body on a fresh frame with the arguments in the first slots
+    """
+    __slots__ = ('name', 'names', 'parameters', 'body', 'result')
+
+    def __init__(self, name, parameters):
+        self.name = name
+        self.names = []
+        self.parameters = parameters
+        self.body = None
+        self.result = None
+
+    def __call__(self, *arguments):
+        if len(arguments) != self.parameters:
+            raise TypeError(f"{self.name}() takes {self.parameters} arguments but {len(arguments)} were given")
+
+        frame = [unset] * len(self.names)
+        frame[:self.parameters] = arguments
+        self.body(frame)
+        return self.result(frame)
+
+    def __repr__(self):
+        return "Function({name}, {body}, {result})".format(name=self.name, body=self.body, result=self.result)
+
+
+class Program:
+    """
+    the statements of a program without a funcdef, its variables are slots of one frame
+    """
+    __slots__ = ('names', 'body')
+
+    def __init__(self, names, body):
+        self.names = names
+        self.body = body
+
+    def __call__(self, namespace):
+        frame = [namespace.get(name, unset) for name in self.names]
+        self.body(frame)
+        namespace.update((name, value) for name, value in zip(self.names, frame) if value is not unset)
+        return namespace
+
+    def __repr__(self):
+        return "Program({body})".format(body=self.body)
+
+
+def missing(name):
+    def call(*arguments):
+        raise NameError(f"name '{name}' is not defined")
+    return call
+
+
+# --- [ Resolver ] --- #
+
+class Interpreter:
+    """
+    resolves the AST of a program and runs it
+    """
+
+    # the nodes whose run differs between the scalar and the vectorized interpreter
+    Not, And, Or, Compare, If, While = Not, And, Or, Compare, If, While
+
+    def __init__(self, grammar=None, expressions="rules"):
+        if grammar is None:
+            grammar = Pseudocode.grammar
+
+        self.grammar = grammar
+        self.expressions = expressions
+        # the flat tree has no wrappers around the expression levels, a nested level is a group
+        self.grouped = levels if expressions == "flat" else ()
+
+        self.names = None
+        self.functions = None
+        self.namespace = None
+
+    def parse(self, program):
+        tokens = Grammar.load(self.grammar).tokenizer.tokenize_stream(program)
+        return Parser(self.grammar, expressions=self.expressions).parse(tokens)
+
+    def load(self, program, namespace=None):
+        """
+        run the program in namespace, a funcdef leaves its Function there
+        """
+        namespace = {} if namespace is None else namespace
+        resolved = self.resolve(self.parse(program), namespace)
+        if isinstance(resolved, Function):
+            namespace[resolved.name] = resolved
+            return namespace
+        return resolved(namespace)
+
+    def resolve(self, ast, functions=None):
+        """
+        the Function of a funcdef or the Program of the statements,
+        a call goes to the funcdef, then to functions and then to the builtins,
+        a name the funcdef never assigns is read from functions when it runs
+        """
+        self.functions = dict(vars(builtins))
+        self.functions.update(functions or {})
+
+        parts = [part for part in items(ast) if isinstance(part, Node)]
+        if parts and parts[0].tag == 'funcdef':
+            self.namespace = {} if functions is None else functions
+            return self.funcdef(parts[0])
+
+        self.namespace = None
+        self.names = {}
+        body = self.block(parts)
+        return Program(list(self.names), body)
+
+    def slot(self, name):
+        if name not in self.names:
+            self.names[name] = len(self.names)
+        return self.names[name]
+
+    def funcdef(self, node):
+        parts = items(node)
+        parameters = [items(parameter)[0]
+                      for clause in items(parts[2])[1:-1]
+                      for parameter in items(clause)[::2]]
+
+        function = Function(parts[1], len(parameters))
+        self.functions[function.name] = function
+
+        self.names = {}
+        for parameter in parameters:
+            self.slot(parameter)
+        # as in Python, a name assigned anywhere in the function is one of its slots
+        for name in assigned(parts[4]):
+            self.slot(name)
+        function.body = self.block(items(parts[4]))
+
+        result = items(parts[5])
+        function.result = self.expression(result[1]) if len(result) == 3 else Constant(None)
+        function.names = list(self.names)
+        return function
+
+    def block(self, nodes):
+        statements = [self.statement(node) for node in nodes if isinstance(node, Node)]
+        return statements[0] if len(statements) == 1 else Block(statements)
+
+    def statement(self, node):
+        parts = items(node)
+
+        if node.tag in ('stmt', 'compound_stmt'):
+            return self.statement(parts[0])
+
+        if node.tag == 'simple_stmt':
+            if isinstance(parts[0], Node) and parts[0].tag == 'assign':
+                return self.statement(parts[0])
+            return self.expression(parts[0])
+
+        if node.tag == 'assign':
+            value = self.expression(parts[2])
+            return Assign(self.slot(parts[0]), value)
+
+        if node.tag == 'if_stmt':
+            branches, otherwise = [], None
+            position = 0
+            while parts[position] != 'fi':
+                if parts[position] == 'else':
+                    otherwise = self.block(items(parts[position + 1]))
+                    position += 2
+                else:
+                    branches.append((self.expression(parts[position + 1]), self.block(items(parts[position + 3]))))
+                    position += 4
+            return self.If(tuple(branches), otherwise)
+
+        if node.tag == 'while_stmt':
+            return self.While(self.expression(parts[1]), self.block(items(parts[3])))
+
+        raise ValueError(f"Cannot resolve a statement from {node.tag}")
+
+    def expression(self, item):
+        if not isinstance(item, Node):
+            return self.atom(item)
+
+        parts = item.children if item.tag in self.grouped else items(item)
+
+        if item.tag == 'call':
+            # the flat tree leaves the parentheses out
+            argument = parts[2] if parts[1] == '(' else parts[1]
+            function = self.functions.get(parts[0]) or missing(parts[0])
+            return Call(function, self.expression(argument), parts[0])
+
+        if item.tag == 'factor' and parts[0] == '(':
+            return self.expression(parts[1])
+
+        if item.tag == 'not_test' and parts[0] == 'not':
+            negations = parts.count('not')
+            operand = self.expression(parts[negations])
+            for _ in range(negations):
+                operand = fold(self.Not(operand))
+            return operand
+
+        if len(parts) == 1:
+            return self.expression(parts[0])
+
+        operands = [self.expression(operand) for operand in parts[::2]]
+
+        if item.tag == 'or_test':
+            return fold(self.Or(operands))
+        if item.tag == 'and_test':
+            return fold(self.And(operands))
+        if item.tag == 'comparison':
+            return fold(self.Compare(tuple(operators[token] for token in parts[1::2]), tuple(operands)))
+
+        if item.tag == 'power':
+            # the exponent is a factor, nested powers group to the right
+            result = operands[-1]
+            for token, operand in zip(reversed(parts[1::2]), reversed(operands[:-1])):
+                result = fold(Binary(operators[token], operand, result))
+            return result
+
+        result = operands[0]
+        for token, operand in zip(parts[1::2], operands[1:]):
+            result = fold(Binary(operators[token], result, operand))
+        return result
+
+    def atom(self, value):
+        if value[0] in "\"'":
+            return Constant(value[1:-1])
+        if value[0].isdigit() or value[0] == ".":
+            return Constant(float(value) if "." in value else int(value))
+        if value in literals:
+            return Constant(literals[value])
+        if self.namespace is not None and value not in self.names:
+            return Global(self.namespace, value)
+        return Load(self.slot(value), value)
+
+
+def assigned(node):
+    """
+    the names assigned in node and the statements below it
+    """
+    names, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Node):
+            if node.tag == 'assign':
+                names.append(items(node)[0])
+            stack.extend(reversed(node.children))
+    return names
+
+
+def fold(node):
+    """
+    a Constant for a node whose operands all are constants,
+    the node itself when evaluating it fails or would build a value too large to keep in the tree
+    """
+    if isinstance(node, Not):
+        operands = (node.operand,)
+    elif isinstance(node, Binary):
+        operands = (node.left, node.right)
+    else:
+        operands = node.operands
+
+    if not all(isinstance(operand, Constant) for operand in operands):
+        return node
+
+    if isinstance(node, Binary) and not affordable(node.operator, node.left.value, node.right.value):
+        return node
+
+    try:
+        return Constant(node(None))
+    except Exception:
+        return node
+
+
+def affordable(function, left, right):
+    """
+    whether function(left, right) is small enough to fold, told from the operands before it is built
+    """
+    if function is operator.mul:
+        if isinstance(right, str):
+            left, right = right, left
+        if isinstance(left, str):
+            return not isinstance(right, int) or len(left) * right <= MAX_STR_SIZE
+        if isinstance(left, int) and isinstance(right, int):
+            return left.bit_length() + right.bit_length() <= MAX_INT_SIZE
+    if function is operator.pow and isinstance(left, int) and isinstance(right, int):
+        return right < 0 or left.bit_length() * right <= MAX_INT_SIZE
+    if function is operator.add and isinstance(left, str) and isinstance(right, str):
+        return len(left) + len(right) <= MAX_STR_SIZE
+    return True
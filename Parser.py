@@ -1,8 +1,9 @@
 import functools
+from collections import OrderedDict
+from time import perf_counter_ns
 from textwrap import indent
 import Tokenizer
-from xml.etree.ElementTree import Element, SubElement, tostring
-import sys
+from AST import NodeBuilder
 
 
 """
@@ -36,566 +37,1078 @@ class Success:
 
 
 class Failure:
-    def __init__(self, value):
-        self.value = value
+    """
+    where a combinator failed and the failure that caused it,
+    the message is only rendered when someone reads it
+    """
+    __slots__ = ('kind', 'position', 'child', 'expected', 'tokens')
+
+    def __init__(self, kind, position, child=None, expected=None, tokens=None):
+        self.kind = kind
+        self.position = position
+        self.child = child
+        self.expected = expected
+        self.tokens = tokens
+
+    @property
+    def value(self):
+        if self.child is None:
+            return f"Unexpected token {self.expected} got {self.tokens[self.position]}"
+
+        err = indent(self.child.value, " " * 4)
+        return f"{self.kind} failed at position {self.position}, got error {{ \n { err } \n }}"
 
     def __repr__(self):
         return f"Failure({self.value})"
 
 
-class Parser:
-    def __init__(self, grammar, cursor=0, length=None):
-        self.grammar = {}
-        self.cursor = cursor
-        self.length = (len(grammar) - cursor
-                       if not length else
-                       length)
+class ParseError(Exception):
+    """
+    raised by parse, reports the furthest position any token was expected at
+    """
+
+    def __init__(self, position, expected, got, failure=None):
+        self.position = position
+        self.expected = expected
+        self.got = got
+        self.failure = failure
+
+        message = f"Expected {' or '.join(sorted(expected))} at position {position}, got {got}"
+        if failure is not None:
+            message += "\n" + failure.value
+        super().__init__(message)
+
+
+def starts(step, first, nullable, kind):
+    """
+    tokens the step can start with and their kinds, (None, None) when it can match nothing
+    """
+    from EBNF import first_of
+
+    tokens, empty = first_of(step.table(), first, nullable)
+    if empty:
+        return None, None
+    return frozenset(tokens), frozenset(map(kind, tokens))
+
+
+# --- [ Combinators ] --- #
+
+class Eat:
+    """
+    consume a token, return Failure if its kind does not match
+
+    kind is the Tokenizer's number for token_type, a keyword is matched by its own kind
+    and never by a NAME that reads the same
+    """
+    __slots__ = ('token_type', 'kind')
+
+    def __init__(self, token_type, kind):
+        self.token_type = token_type
+        self.kind = kind
+
+    def __call__(self, parser):
+        tokens = parser.tokens
+        cursor = parser.cursor
+
+        if parser.stream:
+            matched = tokens.kinds[cursor] == self.kind
+            text = tokens.value_at(cursor) if matched else None
+        else:
+            token = tokens[cursor]
+            matched = token.kind == self.kind
+            text = token.value
+
+        if matched:
+            parser.cursor += 1
+            return Success(parser.builder.token(text))
+
+        if cursor > parser.furthest:
+            parser.furthest = cursor
+            parser.expected = {self.token_type}
+        elif cursor == parser.furthest:
+            parser.expected.add(self.token_type)
+
+        return Failure("Eat", cursor, expected=self.token_type, tokens=tokens)
+
+    def bind(self, name):
+        pass
+
+    def table(self):
+        return ('eat', self.token_type)
+
+    def prune(self, first, nullable, kind):
+        pass
 
+    def __repr__(self):
+        return "Eat({token_type})".format(token_type=self.token_type)
+
+
+class Either:
+    """
+    regex: (a | b | c | ...)
+    """
+    __slots__ = ('sequence', 'choices', 'name')
+
+    def __init__(self, *sequence, name=None):
+        self.sequence = sequence
+        self.choices = tuple((seq, None, None) for seq in sequence)
+        self.name = name
+
+    def __call__(self, parser):
+        kind = parser.lookahead()
+        result = None
+
+        for seq, types, kinds in self.choices:
+            if kinds is not None and kind not in kinds:
+                # the alternative cannot start with this token, it would fail right here
+                parser.miss(types)
+                continue
+
+            start_pos = parser.cursor
+
+            result = seq(parser)
+
+            if isinstance(result, Failure):
+                parser.rollback(parser.cursor - start_pos)
+            else:
+                children = [] if result.value is None else [result.value]
+                return Success(parser.builder.node(self.name, children))
+
+        if result is None:
+            expected = set().union(*(types for _, types, _ in self.choices))
+            result = Failure("Eat", parser.cursor, expected=" or ".join(sorted(expected)), tokens=parser.tokens)
+        return Failure("Either", parser.cursor, result)
+
+    def bind(self, name):
+        if self.name is None:
+            self.name = name
+        for seq in self.sequence:
+            seq.bind(name)
+
+    def table(self):
+        return ('alt',) + tuple(seq.table() for seq in self.sequence)
+
+    def prune(self, first, nullable, kind):
+        self.choices = tuple((seq,) + starts(seq, first, nullable, kind) for seq in self.sequence)
+        for seq in self.sequence:
+            seq.prune(first, nullable, kind)
+
+    def __repr__(self):
+        return "Either({sequence})".format(sequence=self.sequence)
+
+
+class Sequence:
+    """
+    regex: (...)
+    """
+    __slots__ = ('steps', 'name')
+
+    def __init__(self, *steps, name=None):
+        self.steps = steps
+        self.name = name
+
+    def __call__(self, parser):
+        children = []
+        failure = self.collect(parser, children)
+        if failure is not None:
+            return failure
+
+        return Success(parser.builder.node(self.name, children))
+
+    def collect(self, parser, children):
         """
-        parse and store grammar rules
+        run the steps, adding their results to children, return the Failure if one fails
         """
-        grammar_lines = grammar.strip().split("\n")
-        grammar_stripped = map(str.strip, grammar_lines)
-        grammar_nonempty = filter(lambda rule: ":" in rule, grammar_stripped)
-        grammar = list(grammar_nonempty)
+        for step in self.steps:
+            result = step(parser)
 
-        for line in grammar:
-            g_name, rule = line.split(":", 1)
-            self.grammar[g_name] = rule
+            if isinstance(result, Failure):
+                return Failure("Sequence", parser.cursor, result)
 
-    def parse(self, tokens, debug=False):
-        self.tokens = tokens
+            if result.value is not None:
+                children.append(result.value)
 
-        self.eat("SOF", True)
-        # return self.expr().value
+    def bind(self, name):
+        if self.name is None:
+            self.name = name
+        for step in self.steps:
+            step.bind(name)
 
-        if debug:
-            return self
+    def table(self):
+        return ('seq',) + tuple(step.table() for step in self.steps)
 
-        retval = self.SOF()
-        # retval = self.debug()
-        assert isinstance(retval, Success), retval.value
-        return retval.value
+    def prune(self, first, nullable, kind):
+        for step in self.steps:
+            step.prune(first, nullable, kind)
 
-    # --- [ Parser functions ] --- #
+    def __repr__(self):
+        return "Sequence({steps})".format(steps=self.steps)
 
-    def peek(self):
-        if (self.length <= 0):
-            raise IndexError('index out of range')
 
-        return self.tokens[self.cursor]
+class Optional:
+    """
+    regex: (...)?
+    """
+    __slots__ = ('steps', 'sequence', 'types', 'kinds', 'name')
+
+    def __init__(self, *steps, name=None):
+        self.steps = steps
+        self.sequence = Sequence(*steps, name=name)
+        self.types = self.kinds = None
+        self.name = name
+
+    def __call__(self, parser):
+        start_pos = parser.cursor
+        children = []
+
+        if parser.can_start(self.types, self.kinds) and self.sequence.collect(parser, children) is not None:
+            parser.rollback(parser.cursor - start_pos)
+            children.clear()
+
+        return Success(parser.builder.node(self.name, children))
+
+    def bind(self, name):
+        if self.name is None:
+            self.name = name
+        self.sequence.bind(name)
+
+    def table(self):
+        return ('opt',) + tuple(step.table() for step in self.steps)
+
+    def prune(self, first, nullable, kind):
+        self.types, self.kinds = starts(self.sequence, first, nullable, kind)
+        self.sequence.prune(first, nullable, kind)
+
+    def __repr__(self):
+        return "Optional({steps})".format(steps=self.steps)
+
+
+class ZeroOrMore:
+    """
+    regex: (...)*
+    """
+    __slots__ = ('steps', 'sequence', 'types', 'kinds', 'name')
+
+    def __init__(self, *steps, name=None):
+        self.steps = steps
+        self.sequence = Sequence(*steps, name=name)
+        self.types = self.kinds = None
+        self.name = name
+
+    def __call__(self, parser):
+        children = []
+
+        start_pos, count = parser.cursor, 0
+        while parser.can_start(self.types, self.kinds) and self.sequence.collect(parser, children) is None:
+            if parser.cursor == start_pos:
+                # a body that matched no tokens would match none forever
+                break
+            start_pos, count = parser.cursor, len(children)
+
+        parser.rollback(parser.cursor - start_pos)
+        del children[count:]
+        return Success(parser.builder.node(self.name, children))
+
+    def bind(self, name):
+        if self.name is None:
+            self.name = name
+        self.sequence.bind(name)
+
+    def table(self):
+        return ('star',) + tuple(step.table() for step in self.steps)
+
+    def prune(self, first, nullable, kind):
+        self.types, self.kinds = starts(self.sequence, first, nullable, kind)
+        self.sequence.prune(first, nullable, kind)
+
+    def __repr__(self):
+        return "ZeroOrMore({steps})".format(steps=self.steps)
+
+
+class OneOrMore:
+    """
+    regex: (...)+
+    """
+    __slots__ = ('steps', 'sequence', 'types', 'kinds', 'name')
 
-    def eat(self, token_type, shouldCall=False):
+    def __init__(self, *steps, name=None):
+        self.steps = steps
+        self.sequence = Sequence(*steps, name=name)
+        self.types = self.kinds = None
+        self.name = name
+
+    def __call__(self, parser):
+        children = []
+
+        start_pos, count, matches = parser.cursor, 0, 0
+        failure = self.sequence.collect(parser, children)
+        while failure is None:
+            advanced = parser.cursor != start_pos
+            start_pos, count, matches = parser.cursor, len(children), matches + 1
+            if not advanced or not parser.can_start(self.types, self.kinds):
+                break
+            failure = self.sequence.collect(parser, children)
+
+        parser.rollback(parser.cursor - start_pos)
+        del children[count:]
+
+        if not matches:
+            return Failure("OneOrMore", parser.cursor, failure)
+
+        return Success(parser.builder.node(self.name, children))
+
+    def bind(self, name):
+        if self.name is None:
+            self.name = name
+        self.sequence.bind(name)
+
+    def table(self):
+        return ('plus',) + tuple(step.table() for step in self.steps)
+
+    def prune(self, first, nullable, kind):
+        self.types, self.kinds = starts(self.sequence, first, nullable, kind)
+        self.sequence.prune(first, nullable, kind)
+
+    def __repr__(self):
+        return "OneOrMore({steps})".format(steps=self.steps)
+
+
+class Rule:
+    """
+    a named grammar rule, results are cached on (rule, cursor) when the parser memoizes
+    """
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name):
+        self.name = name
+        self.body = None
+
+    def __call__(self, parser):
+        memo = parser.memo
+        if memo is not None:
+            key = (self.name, parser.cursor)
+            if key in memo:
+                parser.cache_hits += 1
+                memo.move_to_end(key)
+                result, parser.cursor = memo[key]
+                return result
+            parser.cache_misses += 1
+
+        result = self.body(parser)
+
+        if memo is not None:
+            memo[key] = (result, parser.cursor)
+            if parser.cache_size is not None and len(memo) > parser.cache_size:
+                memo.popitem(last=False)
+        return result
+
+    def bind(self, name):
         """
-        consume a token, return Failure if type does not match
+        a reference to another rule keeps its own name
         """
-        class Call:
-            def __call__(_self):
-                token = self.peek()
-                if token.type == token_type or token.value == token_type.strip("'"):
-                    self.cursor += 1
-                    # return token
-                    elem = Element("token")
-                    elem.text = token.value
-                    return elem
-                else:
-                    return Failure(f"Unexpected token {token_type} got {self.peek()}")
-
-            def __repr__(_self):
-                return "Eat({token_type})".format(token_type=token_type)
-
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
 
-    def rollback(self, distance):
-        self.cursor -= distance
-        if self.cursor < 0:
-            self.cursor = 0
+    def table(self):
+        return ('rule', self.name)
 
-    @staticmethod
-    def _returnResult(result):
-        if isinstance(result, Failure):
-            return result
-        if isinstance(result, Success):
-            return Success(result.value)
-        return Success(result)
-
-    @staticmethod
-    def run(rule):
-        if callable(rule):
-            result = rule()
-            return Parser._returnResult(result)
+    def prune(self, first, nullable, kind):
+        """
+        the referenced rule's body is pruned on its own
+        """
+
+    def __repr__(self):
+        return "Rule({name})".format(name=self.name)
+
+
+# --- [ Profiling ] --- #
+
+class RuleStats:
+    __slots__ = ('calls', 'successes', 'failures', 'time', 'own', 'tokens', 'rollback')
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.time = 0
+        self.own = 0
+        self.tokens = 0
+        self.rollback = 0
+
+    def __repr__(self):
+        return "RuleStats({calls} calls, {time} ns)".format(calls=self.calls, time=self.time)
+
+
+class Profile:
+    """
+    per rule counters of a profiled parser, times are in nanoseconds:
+        calls, successes, failures
+        time        from entering the rule to leaving it, a recursive call is counted once
+        own         time minus the time of the rules it called
+        tokens      consumed by its successes
+        rollback    tokens its own body stepped back over
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.stacks = {}
+        # frames of the active rules: name, stack, start, time in called rules
+        self.frames = []
+        self.active = {}
+
+    def enter(self, name):
+        stack = self.frames[-1][1] + (name,) if self.frames else (name,)
+        self.frames.append([name, stack, perf_counter_ns(), 0])
+        self.active[name] = self.active.get(name, 0) + 1
+
+    def leave(self, success, consumed):
+        end = perf_counter_ns()
+        name, stack, start, called = self.frames.pop()
+        elapsed = end - start
+
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = RuleStats()
+        stats.calls += 1
+        if success:
+            stats.successes += 1
+            stats.tokens += consumed
         else:
-            return rule
+            stats.failures += 1
 
-    def pretty(self, ast, indent=0):
-        for node in ast:
-            if type(node) is list:
-                self.pretty(node, indent + 2)
+        self.active[name] -= 1
+        if not self.active[name]:
+            stats.time += elapsed
+        stats.own += elapsed - called
+        self.stacks[stack] = self.stacks.get(stack, 0) + elapsed - called
+
+        if self.frames:
+            self.frames[-1][3] += elapsed
+
+    def rollback(self, distance):
+        if self.frames:
+            name = self.frames[-1][0]
+            stats = self.rules.get(name)
+            if stats is None:
+                stats = self.rules[name] = RuleStats()
+            stats.rollback += distance
+
+    def clear(self):
+        self.rules.clear()
+        self.stacks.clear()
+
+    def table(self, sort="own"):
+        """
+        the counters as a text table, the rules with the most of sort first
+        """
+        header = (f"{'rule':<18}{'calls':>9}{'success':>9}{'failure':>9}"
+                  f"{'time ms':>10}{'own ms':>10}{'tokens':>9}{'rollback':>10}")
+        lines = [header]
+        for name, stats in sorted(self.rules.items(), key=lambda item: getattr(item[1], sort), reverse=True):
+            lines.append(f"{name:<18}{stats.calls:>9}{stats.successes:>9}{stats.failures:>9}"
+                         f"{stats.time / 1e6:>10.2f}{stats.own / 1e6:>10.2f}{stats.tokens:>9}{stats.rollback:>10}")
+        return "\n".join(lines)
+
+    def collapsed(self):
+        """
+        own time per rule stack in microseconds, the collapsed stack lines flamegraph.pl reads
+        """
+        return "".join("{stack} {time}\n".format(stack=";".join(stack), time=time // 1000)
+                       for stack, time in sorted(self.stacks.items()) if time >= 1000)
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.collapsed())
+
+
+class ProfiledRule(Rule):
+    """
+    a Rule that reports every call to the parser's Profile
+    """
+    __slots__ = ()
+
+    def __call__(self, parser):
+        profile = parser.profile
+        start_pos = parser.cursor
+        profile.enter(self.name)
+        result = Rule.__call__(self, parser)
+        profile.leave(not isinstance(result, Failure), parser.cursor - start_pos)
+        return result
+
+
+# --- [ Expressions ] --- #
+
+class Precedence:
+    """
+    precedence climbing over the test → or_test → ... → atom rule chain
+
+    the binary levels are climbed in one loop per operand, the operator at the cursor
+    decides which level it belongs to, the tree is the one the rules build,
+    with flat the levels without an operator, the parentheses and the call's punctuation are left out
+    """
+    rules = ('test', 'or_test', 'and_test', 'not_test', 'comparison', 'expr', 'term', 'factor', 'power', 'atom')
+
+    # the binary levels from the loosest, not_test sits between and_test and comparison
+    tags = ('or_test', 'and_test', 'comparison', 'expr', 'term')
+    OR, AND, COMPARISON, EXPR, TERM = range(5)
+
+    def __init__(self, kind, flat=False):
+        def eat(token_type):
+            return Eat(token_type, kind(token_type))
+
+        self.flat = flat
+        self.negation = eat("'not'")
+        self.raise_to = eat("POWOP")
+        self.atoms = tuple(map(eat, ("NAME", "NUMBER", "STRING", "'None'", "'True'", "'False'")))
+        self.calls = (eat("NAME"), eat("'('"), self.expr, eat("')'"))
+        self.parentheses = (eat("'('"), self.expr, eat("')'"))
+        self.operators = tuple(map(eat, ("'or'", "'and'", "COMPOP", "ADDOP", "MULTOP")))
+
+        # an operator token is found by its kind
+        self.by_kind = {eat.kind: level for level, eat in enumerate(self.operators)}
+
+        # the tokens an operand can start with, a miss is recorded like a failed eat
+        self.starts = {eat: starts(eat, {}, (), kind) for eat in (self.raise_to, self.calls[0], self.parentheses[0])}
+        self.starts['atom'] = starts(Either(*self.atoms), {}, (), kind)
+
+        # operators the open levels top to deepest expected, when none of them came
+        self.expected = {
+            (top, deepest): frozenset(eat.token_type for eat in self.operators[top:deepest + 1])
+            for top in range(5) for deepest in range(top, 5)
+        }
+
+    def wrap(self, parser, tag, value):
+        if self.flat:
+            return Success(value)
+        return Success(parser.builder.node(tag, [] if value is None else [value]))
+
+    def collect(self, parser, steps):
+        """
+        the children of steps in a row, or the Failure of the first one that did not match
+        """
+        children = []
+        for step in steps:
+            result = step(parser)
+
+            if isinstance(result, Failure):
+                return Failure("Sequence", parser.cursor, result)
+
+            if result.value is not None:
+                children.append(result.value)
+        return children
+
+    def either(self, parser, tag, alternatives):
+        for alternative in alternatives:
+            start_pos = parser.cursor
+
+            result = alternative(parser)
+
+            if isinstance(result, Failure):
+                parser.rollback(parser.cursor - start_pos)
             else:
-                print(" " * indent, node)
+                return self.wrap(parser, tag, result.value)
+
+        return Failure("Either", parser.cursor, result)
+
+    def missing(self, parser, key):
+        """
+        Failure of an eat the token at the cursor cannot satisfy, None when it can
+        """
+        types, kinds = self.starts[key]
+        if parser.can_start(types, kinds):
+            return None
+        return Failure("Eat", parser.cursor, expected=" or ".join(sorted(types)), tokens=parser.tokens)
+
+    # --- [ Climbing ] --- #
 
-    # --- [ Commands ] --- #
+    def climb(self, parser, top):
+        """
+        the levels from top down to and_test or to term in one loop
 
-    def Either(self, *sequence, shouldCall=False):
+        items holds the operands and operators of every open level, a level is closed
+        into its parent's items once an operator of a looser level comes
         """
-        regex: (a | b | c | ...)
+        bottom = self.AND if top <= self.AND else self.TERM
+
+        operand, deepest = self.operand(parser, bottom, bottom)
+        if isinstance(operand, Failure):
+            return Failure("Sequence", parser.cursor, operand)
+
+        items = [[] for _ in range(top, deepest)] + [[operand.value]]
+        while deepest >= top:
+            level = self.by_kind.get(parser.lookahead())
+
+            if level is None or not top <= level <= deepest:
+                parser.miss(self.expected[top, deepest])
+                break
+
+            # the operator ends the tighter levels
+            for tag in range(deepest, level, -1):
+                closed = self.close(parser, tag, items.pop())
+                items[-1].append(closed)
+            deepest = level
+
+            start_pos = parser.cursor
+            operator = self.operators[level](parser)
+            operand, deepest = self.operand(parser, level + 1, bottom)
+            if isinstance(operand, Failure):
+                # as a failed repetition, the operator is given back
+                parser.rollback(parser.cursor - start_pos)
+                deepest = level
+                break
+
+            items[-1].append(operator.value)
+            items.extend([] for _ in range(level + 1, deepest))
+            if deepest > level:
+                items.append([])
+            items[-1].append(operand.value)
+
+        while len(items) > 1:
+            closed = self.close(parser, top + len(items) - 1, items.pop())
+            items[-1].append(closed)
+        return Success(self.close(parser, top, items[0]) if deepest >= top else items[0][0])
+
+    def operand(self, parser, level, bottom):
         """
+        the operand that opens the levels from level down to bottom, and the deepest level left open
 
-        class Call:
-            def __call__(_self):
-                tag_name = sys._getframe().f_back
-                while tag_name.f_code.co_name in ('__call__', 'run'):
-                    tag_name = tag_name.f_back
-                tag_name = tag_name.f_code.co_name
+        a term that starts with a call is already closed, it takes no operator
+        """
+        if level > bottom:
+            # the right hand side of the tightest operator
+            return (self.not_test if bottom == self.AND else self.factor)(parser), bottom
 
-                for seq in sequence:
-                    start_pos = self.cursor
+        if bottom == self.AND:
+            return self.not_test(parser), bottom
 
-                    result = self.run(seq)
+        start_pos = parser.cursor
+        if self.calls_next(parser):
+            result = self.call(parser)
+            if not isinstance(result, Failure):
+                return self.wrap(parser, 'term', result.value), self.TERM - 1
+            parser.rollback(parser.cursor - start_pos)
 
-                    if isinstance(result, Failure):
-                        self.rollback(self.cursor - start_pos)
+        return self.factor(parser, called=False), self.TERM
 
-                    if isinstance(result, Success):
-                        if result.value is not None:
-                            elem = Element(tag_name)
-                            elem.append(result.value)
-                            return elem
+    def close(self, parser, level, items):
+        """
+        the node of a level from its first operand and the operators with operands that followed
+        """
+        builder = parser.builder
+        tag = self.tags[level]
 
-                            # return result.value
+        if self.flat:
+            items = [item for item in items if item is not None]
+            return builder.node(tag, items) if len(items) > 1 else items[0]
 
-                err = indent(result.value, " " * 4)
-                return Failure(f"Either failed at position {self.cursor}, got error {{ \n { err } \n }}")
+        first, rest = items[0], [item for item in items[1:] if item is not None]
+        children = [] if first is None else [first]
+        tail = builder.node(tag, rest)
+        if tail is not None:
+            children.append(tail)
+        node = builder.node(tag, children)
 
-            def __repr__(_self):
-                return "Either({sequence})".format(sequence=sequence)
+        if level == self.TERM:
+            # the factor sequence is the second alternative of term
+            node = builder.node(tag, [] if node is None else [node])
+        return node
+
+    # --- [ Levels ] --- #
+
+    def test(self, parser):
+        result = self.or_test(parser)
+        if isinstance(result, Failure):
+            return Failure("Sequence", parser.cursor, result)
+        return self.wrap(parser, 'test', result.value)
 
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
+    def or_test(self, parser):
+        return self.climb(parser, self.OR)
 
-    def Sequence(self, *steps, shouldCall=False):
+    def and_test(self, parser):
+        return self.climb(parser, self.AND)
+
+    def not_test(self, parser):
+        return self.either(parser, 'not_test', (self.negated, self.comparison))
+
+    def negated(self, parser):
+        children = self.collect(parser, (self.negation, self.not_test))
+        if isinstance(children, Failure):
+            return children
+        return Success(parser.builder.node('not_test', children))
+
+    def comparison(self, parser):
+        return self.climb(parser, self.COMPARISON)
+
+    def expr(self, parser):
+        return self.climb(parser, self.EXPR)
+
+    def term(self, parser):
+        return self.climb(parser, self.TERM)
+
+    def factor(self, parser, called=True):
+        """
+        call | '(' expr ')' | power, picked by the token at the cursor
+
+        the atom alternative is left out, it fails wherever power does,
+        without called the call was tried at the cursor already
+        """
+        start_pos = parser.cursor
+
+        if called and self.calls_next(parser):
+            result = self.call(parser)
+            if not isinstance(result, Failure):
+                return self.wrap(parser, 'factor', result.value)
+            parser.rollback(parser.cursor - start_pos)
+
+        if parser.can_start(*self.starts[self.parentheses[0]]):
+            result = self.parenthesised(parser)
+            if not isinstance(result, Failure):
+                return self.wrap(parser, 'factor', result.value)
+            parser.rollback(parser.cursor - start_pos)
+
+        result = self.power(parser)
+        if not isinstance(result, Failure):
+            return self.wrap(parser, 'factor', result.value)
+        return Failure("Either", parser.cursor, result)
+
+    def calls_next(self, parser):
         """
-        regex: (...)
+        whether a name and an opening parenthesis come, most names are no call
         """
+        if not parser.can_start(*self.starts[self.calls[0]]):
+            return False
+
+        parser.cursor += 1
+        opening = parser.can_start(*self.starts[self.parentheses[0]])
+        parser.cursor -= 1
+        return opening
+
+    def call(self, parser):
+        children = self.collect(parser, self.calls)
+        if isinstance(children, Failure):
+            return children
+        if self.flat:
+            del children[1::2]
+        return Success(parser.builder.node('call', children))
+
+    def parenthesised(self, parser):
+        children = self.collect(parser, self.parentheses)
+        if isinstance(children, Failure):
+            return children
+        if self.flat:
+            return Success(children[1])
+        return Success(parser.builder.node('factor', children))
+
+    def power(self, parser):
+        base = self.atom(parser)
+        if isinstance(base, Failure):
+            return Failure("Sequence", parser.cursor, base)
+
+        exponent = []
+        if parser.can_start(*self.starts[self.raise_to]):
+            start_pos = parser.cursor
+            exponent = self.collect(parser, (self.raise_to, self.factor))
+            if isinstance(exponent, Failure):
+                parser.rollback(parser.cursor - start_pos)
+                exponent = []
+
+        builder = parser.builder
+        if self.flat:
+            return Success(builder.node('power', [base.value] + exponent) if exponent else base.value)
+
+        children = [] if base.value is None else [base.value]
+        tail = builder.node('power', exponent)
+        if tail is not None:
+            children.append(tail)
+        return Success(builder.node('power', children))
+
+    def atom(self, parser):
+        result = self.missing(parser, 'atom')
+        if result is None:
+            for eat in self.atoms:
+                result = eat(parser)
+                if not isinstance(result, Failure):
+                    return self.wrap(parser, 'atom', result.value)
+
+        return Failure("Either", parser.cursor, result)
+
+
+class Expression:
+    """
+    the body of a rule parsed by the Precedence engine, exports the rule it replaced
+    """
+    __slots__ = ('level', 'body')
+
+    def __init__(self, level, body):
+        self.level = level
+        self.body = body
+
+    def __call__(self, parser):
+        return self.level(parser)
+
+    def bind(self, name):
+        pass
+
+    def table(self):
+        return self.body.table()
+
+    def prune(self, first, nullable, kind):
+        pass
+
+    def __repr__(self):
+        return "Expression({name})".format(name=self.level.__name__)
+
+
+combinators = {
+    'seq': Sequence,
+    'alt': Either,
+    'opt': Optional,
+    'star': ZeroOrMore,
+    'plus': OneOrMore,
+}
+
 
-        class Call():
-            def __call__(_self):
-                tag_name = sys._getframe().f_back
-                while tag_name.f_code.co_name in ('__call__', 'run'):
-                    tag_name = tag_name.f_back
-                tag_name = tag_name.f_code.co_name
+def combinator(expr, rules, kind):
+    """
+    the combinator of a rule table entry, see EBNF, a ('rule', name) is the Rule itself
+    """
+    tag, items = expr[0], expr[1:]
 
-                elem = Element(tag_name)
-                # results = []
-                for step in steps:
-                    result = self.run(step)
+    if tag == 'eat':
+        token_type, = items
+        return Eat(token_type, kind(token_type))
 
-                    if isinstance(result, Failure):
-                        err = indent(result.value, " " * 4)
-                        return Failure(f"Sequence failed at position {self.cursor}, got error {{ \n { err } \n }}")
+    if tag == 'rule':
+        name, = items
+        return rules[name]
 
-                    if isinstance(result, Success):
-                        if result.value is not None:
-                            # if type(result.value) is list and len(result.value) == 1:
-                            #    results += result.value
-                            # else:
-                            #    results.append(result.value)
-                            elem.append(result.value)
+    return combinators[tag](*(combinator(item, rules, kind) for item in items))
 
-                return elem
-                # return results
 
-            def __repr__(_self):
-                return "Sequence({steps})".format(steps=steps)
+class Parser:
+    """
+    parses with the combinator graph of the grammar's rule table,
+    a rule can be run on its own as a method of the same name, parser.stmt()
+    """
+    graphs = {}
+
+    def __init__(self, grammar, cursor=0, length=None, memoize=False, cache_size=None, builder=None,
+                 expressions="rules", iterative=False, profile=False):
+        self.grammar = grammar
+        self.expressions = expressions
+        self.start = self.table(grammar).start
+        self.rules = self.build(grammar, expressions)
+        self.program = self.machine(grammar, expressions) if iterative else None
+        self.builder = builder if builder is not None else NodeBuilder()
+        self.offset = cursor
+        self.cursor = cursor
+        self.memo = OrderedDict() if memoize else None
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.length = (len(grammar) - cursor
+                       if not length else
+                       length)
+        self.profile = None
+        if profile:
+            self.profiling(True)
+
+    @classmethod
+    def build(cls, grammar, expressions="rules", profiled=False):
+        """
+        build the combinator graph of the grammar's rule table, once per grammar
 
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
+        expressions picks what parses the test → atom chain:
+            rules       the rules of the grammar
+            precedence  the Precedence engine, same tree
+            flat        the Precedence engine, flattened tree
 
-    def Optional(self, *steps, shouldCall=False):
+        a profiled graph is a copy of ProfiledRules, the plain one pays nothing for it
         """
-        regex: (...)?
+        if expressions not in ("rules", "precedence", "flat"):
+            raise ValueError(f"Unknown expressions engine {expressions}")
+
+        key = (cls, grammar, expressions, profiled)
+        if key not in cls.graphs:
+            ebnf = cls.table(grammar)
+            table = ebnf.rules
+            rules = {name: (ProfiledRule if profiled else Rule)(name) for name in table}
+            kind = cls.kinds(grammar)
+
+            for name, expr in table.items():
+                rules[name].body = combinator(expr, rules, kind)
+                rules[name].body.bind(name)
+
+            # let the choices skip what cannot start with the current token, the FIRST sets come with the grammar
+            for node in rules.values():
+                node.body.prune(ebnf.first, ebnf.nullable, kind)
+
+            if expressions != "rules":
+                missing = [name for name in Precedence.rules if name not in rules]
+                if missing:
+                    raise ValueError(f"The {expressions} engine needs the rules {', '.join(missing)}")
+                engine = Precedence(kind, flat=expressions == "flat")
+                for name in Precedence.rules:
+                    rules[name].body = Expression(getattr(engine, name), rules[name].body)
+            cls.graphs[key] = rules
+
+        return cls.graphs[key]
+
+    @classmethod
+    def table(cls, grammar):
         """
-        class Call:
-            def __call__(_self):
-                tag_name = sys._getframe().f_back
-                while tag_name.f_code.co_name in ('__call__', 'run'):
-                    tag_name = tag_name.f_back
-                tag_name = tag_name.f_code.co_name
+        the EBNF rule table of the grammar, the graph and the machine both run it
+        """
+        import Grammar
+        return Grammar.load(grammar).ebnf
 
-                sequence = self.Sequence(*steps)
+    @classmethod
+    def kinds(cls, grammar):
+        """
+        the kind of a grammar token as the grammar's Tokenizer numbers it, see Tokenizer.kind
+        """
+        import Grammar
+        return Grammar.load(grammar).tokenizer.kind
 
-                start_pos = self.cursor
+    @classmethod
+    def machine(cls, grammar, expressions="rules"):
+        """
+        the grammar's rule table compiled to EBNF bytecode
 
-                result = self.run(sequence)
+        the machine keeps its calls and choices on lists, so nesting is not bound by the recursion limit,
+        it builds the rules' tree and does not memoize
+        """
+        if expressions == "flat":
+            raise ValueError("The iterative parser builds the rules' tree, it cannot flatten expressions")
 
-                if isinstance(result, Failure):
-                    self.rollback(self.cursor - start_pos)
-                    return Element(tag_name)
-                    # return None
+        return cls.table(grammar).program
 
-                if isinstance(result, Success):
-                    elem = Element(tag_name)
-                    elem.extend(result.value)
-                    return elem
-                    # return result.value
+    def parse(self, tokens, debug=False):
+        if not hasattr(tokens, "__getitem__"):
+            tokens = Tokenizer.TokenBuffer(tokens)
 
-            def __repr__(_self):
-                return "Optional({steps})".format(steps=steps)
+        self.reset(tokens, self.offset)
 
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
+        self.eat("SOF")
+        # return self.expr().value
 
-    def ZeroOrMore(self, *steps, shouldCall=False):
+        if debug:
+            return self
+
+        if self.program is not None:
+            from EBNF import run
+            return run(self.program, self.tokens, self.builder, self.cursor)
+
+        retval = self.rules[self.start](self)
+        if isinstance(retval, Failure):
+            raise ParseError(self.furthest, self.expected, self.tokens[self.furthest], retval)
+
+        # the program has to be all of the tokens, a tail that does not parse is an error and not dropped
+        if self.lookahead() != Tokenizer.EOF:
+            self.miss({"EOF"})
+            raise ParseError(self.furthest, self.expected, self.tokens[self.furthest])
+        return retval.value
+
+    # --- [ Parser functions ] --- #
+
+    def __getattr__(self, name):
+        """
+        a rule as a method parsing it at the cursor
+        """
+        rules = self.__dict__.get('rules')
+        if rules is None or name not in rules:
+            raise AttributeError(f"{type(self).__name__} has no attribute or rule {name}")
+        return functools.partial(rules[name], self)
+
+    def reset(self, tokens, cursor):
+        """
+        start over on tokens at cursor
+        """
+        self.tokens = tokens
+        self.stream = isinstance(tokens, Tokenizer.TokenStream)
+        self.cursor = cursor
+        self.furthest = cursor
+        self.expected = set()
+        self.clear_cache()
+
+    def peek(self):
+        if (self.length <= 0):
+            raise IndexError('index out of range')
+
+        return self.tokens[self.cursor]
+
+    def lookahead(self):
+        """
+        kind of the token at the cursor
+        """
+        if self.stream:
+            return self.tokens.kinds[self.cursor]
+        return self.tokens[self.cursor].kind
+
+    def can_start(self, types, kinds):
+        """
+        whether the token at the cursor is of kinds, a miss records types as expected
+        """
+        if types is None:
+            return True
+
+        if self.lookahead() in kinds:
+            return True
+
+        self.miss(types)
+        return False
+
+    def miss(self, types):
+        """
+        note tokens that were expected at the cursor, as the Eats skipped would have
+        """
+        if self.cursor > self.furthest:
+            self.furthest = self.cursor
+            self.expected = set(types)
+        elif self.cursor == self.furthest:
+            self.expected |= types
+
+    def eat(self, token_type):
+        """
+        consume a token, return Failure if type does not match
+        """
+        return Eat(token_type, self.kinds(self.grammar)(token_type))(self)
+
+    def clear_cache(self):
+        """
+        drop memoized results, they are only valid for the current tokens
+        """
+        if self.memo is not None:
+            self.memo.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def rollback(self, distance):
+        self.cursor -= distance
+        if self.cursor < 0:
+            self.cursor = 0
+
+    # --- [ Profiling ] --- #
+
+    def profiling(self, enabled=True):
         """
-        regex: (...)*
+        switch the per rule counters of self.profile on or off, switched on they start from zero
+
+        the iterative machine and the levels inside the Precedence engine are not counted
         """
+        self.rules = self.build(self.grammar, self.expressions, profiled=enabled)
+        if enabled:
+            self.profile = Profile()
+            self.rollback = self.profiled_rollback
+        else:
+            self.profile = None
+            self.__dict__.pop('rollback', None)
 
-        class Call:
-            def __call__(_self):
-                tag_name = sys._getframe().f_back
-                while tag_name.f_code.co_name in ('__call__', 'run'):
-                    tag_name = tag_name.f_back
-                tag_name = tag_name.f_code.co_name
-
-                sequence = self.Sequence(*steps)
-                # results = []
-                elem = Element(tag_name)
-
-                start_pos = self.cursor
-                result = self.run(sequence)
-                while not isinstance(result, Failure):
-                    if isinstance(result, Success):
-                        # results.append(result.value)
-                        elem.extend(result.value)
-
-                    start_pos = self.cursor
-                    result = self.run(sequence)
-
-                self.rollback(self.cursor - start_pos)
-                # return results
-                return elem
-
-            def __repr__(_self):
-                return "ZeroOrMore({steps})".format(steps=steps)
-
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
-
-    def OneOrMore(self, *steps, shouldCall=False):
-        """
-        regex: (...)+
-        """
-
-        class Call:
-            def __call__(_self):
-                tag_name = sys._getframe().f_back
-                while tag_name.f_code.co_name in ('__call__', 'run'):
-                    tag_name = tag_name.f_back
-                tag_name = tag_name.f_code.co_name
-
-                sequence = self.Sequence(*steps)
-                # results = []
-                elem = Element(tag_name)
-
-                start_pos = self.cursor
-                result = self.run(sequence)
-                while not isinstance(result, Failure):
-                    if isinstance(result, Success):
-                        # results.append(result.value)
-                        elem.extend(result.value)
-
-                    start_pos = self.cursor
-                    result = self.run(sequence)
-
-                self.rollback(self.cursor - start_pos)
-
-                # if not results:
-                if not elem.getchildren():
-                    err = indent(result.value, " " * 4)
-                    return Failure(f"OneOrMore failed at position {self.cursor}, got error {{ \n { err } \n }}")
-
-                return elem
-                # return results
-
-            def __repr__(_self):
-                return "OneOrMore({steps})".format(steps=steps)
-
-        call = Call()
-        if shouldCall:
-            return call()
-        return call
-
-    # --- [ Rules ] --- #
-
-    def SOF(self):
-        result = self.Either(
-            self.funcdef,
-            self.OneOrMore(
-                self.stmt
-            )
-        )
-        return self.run(result)
-
-    def funcdef(self):
-        result = self.Sequence(
-            self.eat("'FUNCTION'"),
-            self.eat("NAME"),
-            self.parameter_clause,
-            self.eat(":"),
-            self.suite,
-            self.return_stmt
-        )
-        # print("funcdef")
-        return self.run(result)
-
-    def return_stmt(self):
-        result = self.Sequence(
-            self.eat("'RETURN'"),
-            self.Optional(self.test),
-            self.eat(";")
-        )
-        # print("return_stmt")
-        return self.run(result)
-
-    def parameter_clause(self):
-        result = self.Sequence(
-            self.eat("("),
-            self.Optional(self.parameters),
-            self.eat(")")
-        )
-        # print("parameter_clause")
-        return self.run(result)
-
-    def parameters(self):
-        result = self.Sequence(
-            self.parameter,
-            self.ZeroOrMore(
-                self.eat(","),
-                self.parameter
-            )
-        )
-        # print("parameters")
-        return self.run(result)
-
-    def parameter(self):
-        result = self.Sequence(
-            self.eat("NAME")
-        )
-        # print("parameter")
-        return self.run(result)
-
-    def stmt(self):
-        result = self.Either(
-            self.simple_stmt,
-            self.compound_stmt
-        )
-        # print("stmt")
-        return self.run(result)
-
-    def simple_stmt(self):
-        result = self.Sequence(
-            self.Either(
-                self.call,
-                self.assign,
-                self.expr
-            ),
-            self.eat(';')
-        )
-        # print("simple_stmt")
-        return self.run(result)
-
-    def assign(self):
-        result = self.Sequence(
-            self.eat("NAME"),
-            self.Either(
-                self.eat("'←'"),
-                self.eat("'='")
-            ),
-            self.expr
-        )
-        # print("assign")
-        return self.run(result)
-
-    def call(self):
-        result = self.Sequence(
-            self.eat("NAME"),
-            self.eat("("),
-            self.expr,
-            self.eat(")")
-        )
-        # print("call")
-        return self.run(result)
-
-    def compound_stmt(self):
-        result = self.Either(
-            self.if_stmt,
-            self.while_stmt
-        )
-        # print("compound_stmt")
-        return self.run(result)
-
-    def if_stmt(self):
-        result = self.Sequence(
-            self.eat("'if'"),
-            self.test,
-            self.eat("then"),
-            self.suite,
-            self.ZeroOrMore(
-                self.eat("'elif'"),
-                self.test,
-                self.eat("'then'"),
-                self.suite
-            ),
-            self.Optional(
-                self.eat("'else'"),
-                self.suite
-            ),
-            self.eat("'fi'")
-        )
-        # print("if_stmt")
-        return self.run(result)
-
-    def while_stmt(self):
-        result = self.Sequence(
-            self.eat("'while'"),
-            self.test,
-            self.eat("then"),
-            self.suite,
-            self.eat("'done'")
-        )
-        # print("while_stmt")
-        return self.run(result)
-
-    def suite(self):
-        result = self.Either(
-            self.simple_stmt,
-            self.OneOrMore(
-                self.stmt
-            )
-        )
-        # print("suite")
-        return self.run(result)
-
-    def test(self):
-        result = self.Sequence(
-            self.or_test
-        )
-        # print("test")
-        return self.run(result)
-
-    def or_test(self):
-        result = self.Sequence(
-            self.and_test,
-            self.ZeroOrMore(
-                self.eat('or'),
-                self.and_test
-            )
-        )
-        # print("or_test")
-        return self.run(result)
-
-    def and_test(self):
-        result = self.Sequence(
-            self.not_test,
-            self.ZeroOrMore(
-                self.eat('and'),
-                self.not_test
-            )
-        )
-        # print("and_test")
-        return self.run(result)
-
-    def not_test(self):
-        result = self.Either(
-            self.Sequence(
-                self.eat('not'),
-                self.not_test
-            ),
-            self.comparison
-        )
-        # print("not_test")
-        return self.run(result)
-
-    def comparison(self):
-        result = self.Sequence(
-            self.expr,
-            self.ZeroOrMore(
-                self.eat("COMPOP"),
-                self.expr
-            )
-        )
-        # print("comparison")
-        return self.run(result)
-
-    def expr(self):
-        result = self.Sequence(
-            self.term,
-            self.ZeroOrMore(
-                self.eat("ADDOP"),
-                self.term
-            )
-        )
-        # print("expr")
-        return self.run(result)
-
-    def term(self):
-        result = self.Either(
-            self.call,
-            self.Sequence(
-                self.factor,
-                self.ZeroOrMore(
-                    self.eat("MULTOP"),
-                    self.factor
-                )
-            )
-        )
-        # print("term")
-        return self.run(result)
-
-    def factor(self):
-        result = self.Either(
-            self.call,
-            self.Sequence(
-                self.eat("("),
-                self.expr,
-                self.eat(")")
-            ),
-            self.power,
-            self.atom
-        )
-        # print("factor")
-        return self.run(result)
-
-    def power(self):
-        result = self.Sequence(
-            self.atom,
-            self.Optional(
-                self.eat("POWOP"),
-                self.factor
-            )
-        )
-        # print("power")
-        return self.run(result)
-
-    def atom(self):
-        result = self.Either(
-            self.eat("NAME"),
-            self.eat("NUMBER"),
-            self.eat("STRING"),
-            self.eat("'None'"),
-            self.eat("'True'"),
-            self.eat("'False'")
-        )
-        # print("atom")
-        return self.run(result)
+    def profiled_rollback(self, distance):
+        self.profile.rollback(distance)
+        Parser.rollback(self, distance)
+
+    def pretty(self, ast, indent=0):
+        for node in ast:
+            if type(node) is list:
+                self.pretty(node, indent + 2)
+            else:
+                print(" " * indent, node)
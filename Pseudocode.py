@@ -0,0 +1,60 @@
+"""
+the grammar of the pseudocode, read by the Tokenizer, the EBNF rule table and everything built on them
+"""
+grammar = """
+    SOF: funcdef | stmt+
+
+    funcdef: 'FUNCTION' NAME parameter_clause ':' suite return_stmt
+    return_stmt: 'RETURN' [test] ';'
+
+    parameter_clause: '(' [parameters] ')'
+    parameters: parameter (',' parameter)*
+    parameter: NAME
+
+    suite: simple_stmt | stmt+
+
+    stmt: simple_stmt | compound_stmt
+    simple_stmt: (call | assign | expr) ';'
+
+    assign: NAME ('←' | '=') expr
+    call: NAME '(' expr ')'
+
+    compound_stmt: if_stmt | while_stmt
+    if_stmt: 'if' test 'then' suite ('elif' test 'then' suite)* ['else' suite] 'fi'
+    while_stmt: 'while' test 'then' suite 'done'
+
+    test: or_test
+    or_test: and_test ('or' and_test)*
+    and_test: not_test ('and' not_test)*
+    not_test: 'not' not_test | comparison
+    comparison: expr (COMPOP expr)*
+
+    expr: term (ADDOP term)*
+    term: call | factor (MULTOP factor)*
+    factor: call | '(' expr ')' | power | atom
+    power: atom [POWOP factor]
+
+    atom: NAME | NUMBER | STRING | 'None' | 'True' | 'False'
+
+    NAME: [a-zA-Z_][a-zA-Z0-9_]*
+    NUMBER: ([0-9]*\.[0-9]+|[0-9]+)
+    STRING: (\"|\')[a-zA-Z0-9]*(\"|\')
+    COMPOP: (\=\=|\>\=|\<\=|\<\>|\!\=|\<|\>)
+    POWOP: (\*\*)
+    ADDOP: (\+|\-|\−)
+    MULTOP: (\/\/|\*|\·|\/|\%)
+    IGNORABLE: \s+
+"""
+
+"""
+rules EBNF:
+    <name>: <rule>
+    <rule>: <option1> | <option2> | ... | <optionN>
+    <rule>: <repeat0orMore>*
+    <rule>: <repeat1orMore>+
+    <rule>: [<optional>]
+    <rule>: 'word'
+    <rule>: <anotherRule>
+    <rule>: (<group>)
+    <rule>: <TERMINAL>
+"""
@@ -0,0 +1,56 @@
+"""
+programs the tests run through every engine, a recursive function, a loop and random expressions
+"""
+
+modes = ["rules", "precedence", "flat"]
+
+funkce = """
+FUNCTION funkceG(x):
+  if  x<0  then  x ← 0; fi
+  if  x<14  then
+    r ← funkceG(58−4·x)−9;
+  else
+    r ← 39;
+  fi
+  RETURN r;
+"""
+
+loop = """
+a ← 1; b = 2.5; s ← "hi"; n ← 0;
+while a < 10 and not not b <> 3 then
+  if a // 2 * 2 <> a then b ← b ** 2 ** 1 % 7; elif not a > 3 or False then n ← n + 1; else t ← (a − 1) · (b + 2); fi
+  a ← a + 1;
+done
+"""
+
+# a term starting with a call is only the call, so the calls are wrapped before an operator follows
+atoms = ["x", "y", "2", "3", "1.5", "0", "(x − y)", "(f(x))", "(f(x − 1))"]
+operators = ["+", "−", "-", "*", "·", "/", "//", "%", "**"]
+comparisons = ["<", ">", "==", "<=", ">=", "<>", "!="]
+
+
+def arithmetic(random, depth, atoms=atoms, operators=operators):
+    if depth == 0 or random.random() < 0.3:
+        return random.choice(atoms)
+    operator = random.choice(operators)
+    if operator == "**":
+        return random.choice(["x", "2", "y"]) + " ** " + arithmetic(random, depth - 1, atoms, operators)
+    code = arithmetic(random, depth - 1, atoms, operators) + " " + operator + " " + arithmetic(
+        random, depth - 1, atoms, operators)
+    return "(" + code + ")" if random.random() < 0.5 else code
+
+
+def condition(random, depth, atoms=atoms, operators=operators):
+    """
+    comparisons joined by and, or and not, the grammar takes them in a test only and not in parentheses
+    """
+    if depth == 0 or random.random() < 0.3:
+        comparison = arithmetic(random, 2, atoms, operators)
+        for _ in range(random.randrange(3)):
+            comparison += " " + random.choice(comparisons) + " " + arithmetic(random, 2, atoms, operators)
+        return comparison
+    operator = random.choice(["and", "or", "not"])
+    if operator == "not":
+        return "not " + condition(random, depth - 1, atoms, operators)
+    return (condition(random, depth - 1, atoms, operators) + " " + operator + " "
+            + condition(random, depth - 1, atoms, operators))
@@ -1,10 +1,20 @@
+import mmap
 import re
+import sys
+from array import array
+
+
+SOF = 0
+EOF = 1
 
 
 class Token:
-    def __init__(self, _type, _value):
+    __slots__ = ('type', 'value', 'kind')
+
+    def __init__(self, _type, _value, kind=None):
         self.type = _type
         self.value = _value
+        self.kind = kind
 
     def __str__(self):
         return 'Token({type}, {value})'.format(
@@ -16,7 +26,116 @@ class Token:
         return self.__str__()
 
 
+class TokenStream:
+    """
+    tokens as parallel arrays of kinds and source offsets,
+    values are sliced from the source only when asked for
+
+    a bytes source, such as a mapped file, has byte offsets and its values are decoded with encoding
+    """
+
+    def __init__(self, source, names, encoding=None):
+        self.source = source
+        self.names = names
+        self.encoding = encoding
+        self.kinds = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+
+    def append(self, kind, start, end):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def type_at(self, index):
+        return self.names[self.kinds[index]]
+
+    def value_at(self, index):
+        kind = self.kinds[index]
+        if kind == SOF:
+            return "SOF"
+        if kind == EOF:
+            return None
+        if self.encoding is not None:
+            return str(self.source[self.starts[index]:self.ends[index]], self.encoding)
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+        return Token(self.type_at(index), self.value_at(index), self.kinds[index])
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.kinds)))
+
+    def __repr__(self):
+        return "TokenStream({tokens})".format(tokens=list(self))
+
+
+class TokenBuffer:
+    """
+    list-like view over a token iterator, pulls tokens as they are indexed
+    """
+
+    def __init__(self, tokens):
+        self.iterator = iter(tokens)
+        self.tokens = []
+
+    def __getitem__(self, index):
+        try:
+            return self.tokens[index]
+        except IndexError:
+            for token in self.iterator:
+                self.tokens.append(token)
+                if len(self.tokens) > index:
+                    return token
+            raise
+
+    def __len__(self):
+        self.tokens.extend(self.iterator)
+        return len(self.tokens)
+
+
+def trie(keywords):
+    """
+    a pattern matching the longest of the keywords, a branch per first character and so on,
+    a keyword ending in a word character must end where a word does
+    """
+    root = {}
+    for keyword in keywords:
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = r"\b" if re.match(r"\w", keyword[-1]) else ""
+
+    def pattern(node):
+        # the longer keywords are tried before the one ending here
+        alternatives = [re.escape(char) + pattern(node[char]) for char in sorted(node) if char]
+        if "" in node:
+            alternatives.append(node[""])
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:{alternatives})".format(alternatives="|".join(alternatives))
+
+    return pattern(root)
+
+
 class Tokenizer:
+    """
+    lexes code with the keywords and terminals of a grammar
+
+    a word keyword is lexed by the terminal matching it, NAME, and told apart by looking the name up,
+    the other keywords are one pattern shaped like a trie of their characters, so the longest one wins,
+    and a terminal matching more than that keyword wins over it, '==' is COMPOP and not '=' twice
+
+    every keyword and every terminal is a kind of its own, numbered after SOF and EOF
+    with the longest keywords first and the terminals in grammar order,
+    so the same grammar always gives the same numbers
+    """
+
     def __init__(self, grammar):
         self.terminals = {}
         self.keywords = set()
@@ -26,35 +145,212 @@ class Tokenizer:
         grammar_nonempty = filter(lambda rule: ":" in rule, grammar_stripped)
         grammar = list(grammar_nonempty)
 
-        for line in grammar:
+        # the first rule is the start rule, the remaining upper case ones are terminals
+        for index, line in enumerate(grammar):
             t_name, rule = line.split(":", 1)
-            if t_name.isupper():
+            if t_name.isupper() and index > 0:
                 self.terminals[t_name] = "\A({rule})".format(rule=rule.strip())
 
             else:
-                keywords = re.findall("\'([^\']+)\'", rule)
-                for keyword in keywords:
-                    reg = "\A({rule})".format(rule=keyword if keyword.isalpha() else "\\" + keyword)
-                    self.keywords.add(('KEYWORD', reg))
+                self.keywords.update(re.findall("\'([^\']+)\'", rule))
+
+        self.pattern, self.terminal_pattern, self.groups, self.names, self.kinds, self.words = self.compile()
+        self.whitespace = re.compile(r"\s*")
+        self.binary = self.encode()
+
+    def compile(self):
+        """
+        join the keyword trie and the terminals into a single alternation, tried in that order
+
+        returns the pattern, the terminals alone for a match longer than a keyword's, the kind of each group, the token type of each kind,
+        the kind of each keyword and terminal and, for the groups whose match can be a keyword,
+        the kind of each keyword they match
+        """
+        keywords = sorted(self.keywords, key=lambda keyword: (-len(keyword), keyword))
+        terminals = list(self.terminals.items())
+
+        names = ["SOF", "EOF"]
+        kinds = {"SOF": SOF, "EOF": EOF}
+        for spec, tokenType in [(keyword, 'KEYWORD') for keyword in keywords] + [(t, t) for t, _ in terminals]:
+            kinds[spec] = len(names)
+            names.append(sys.intern(tokenType))
+
+        groups = {}
+        words = {}
+        symbols = {}
+        for keyword in keywords:
+            # the first terminal matching all of a keyword lexes it, as NAME does 'if'
+            for index, (terminal, reg) in enumerate(terminals):
+                if re.fullmatch(reg, keyword):
+                    words.setdefault("_{index}".format(index=index + 1), {})[keyword] = kinds[keyword]
+                    break
+            else:
+                symbols[keyword] = kinds[keyword]
+
+        alternatives = []
+        if symbols:
+            groups["_0"] = -1
+            words["_0"] = symbols
+            alternatives.append("(?P<_0>{rule})".format(rule=trie(symbols)))
+
+        for index, (terminal, reg) in enumerate(terminals, 1):
+            name = "_{index}".format(index=index)
+            groups[name] = kinds[terminal]
+            alternatives.append("(?P<{name}>{rule})".format(name=name, rule=reg[len("\\A"):]))
+
+        terminal_pattern = re.compile("|".join(alternatives[1:])) if symbols and terminals else None
+        return re.compile("|".join(alternatives)), terminal_pattern, groups, tuple(names), kinds, words
+
+    def encode(self, encoding="utf-8"):
+        """
+        the patterns, the whitespace and the keyword tables for lexing bytes in encoding,
+        a character outside ASCII may stand in the grammar as a literal but not inside a [class]
+        """
+        pattern = re.compile(self.pattern.pattern.encode(encoding))
+        terminal_pattern = self.terminal_pattern and re.compile(self.terminal_pattern.pattern.encode(encoding))
+        words = {name: {keyword.encode(encoding): kind for keyword, kind in table.items()}
+                 for name, table in self.words.items()}
+        return pattern, terminal_pattern, re.compile(rb"\s*"), words
+
+    def kind(self, token_type):
+        """
+        the kind of a grammar token, NAME or 'if', a bare word is a terminal if there is one and a keyword if not,
+        -1 for a token the grammar does not have
+        """
+        if token_type.startswith("'") or token_type not in self.kinds:
+            return self.kinds.get(token_type.strip("'"), -1)
+        return self.kinds[token_type]
 
     def tokenize(self, code):
-        self.code = code
-        tokens = []
-
-        while len(self.code) != 0:
-            token = self.tokenize_one_token()
-            if token.type != "IGNORABLE":
-                tokens.append(token)
-            self.code = self.code.strip()
-
-        return [Token("SOF", "SOF")] + tokens + [Token("EOF", None)]
-
-    def tokenize_one_token(self):
-        for (tokenType, reg) in tuple(self.keywords) + tuple(self.terminals.items()):
-            match = re.search(reg, self.code)
-            if match is not None:
-                value = match.group(1)
-                self.code = self.code[len(value):]
-                return Token(tokenType, value)
-
-        raise RuntimeError("Couldn't match token on {}".format(self.code))
+        names = self.names
+        tokens = [Token("SOF", "SOF", SOF)]
+        tokens.extend(Token(names[kind], code[start:end], kind) for kind, start, end in self.spans(code))
+        tokens.append(Token("EOF", None, EOF))
+        return tokens
+
+    def tokenize_stream(self, code):
+        """
+        like tokenize, but returns a TokenStream over the code
+        """
+        return collect(TokenStream(code, self.names), self.spans(code))
+
+    def tokenize_file(self, path, encoding="utf-8"):
+        """
+        like tokenize_stream, but lexes the file at path through a memory map,
+        the source is never read into a string and values are decoded when they are asked for
+        """
+        with open(path, "rb") as file:
+            try:
+                code = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # an empty file cannot be mapped
+                code = b""
+
+        lexer = self.binary if encoding == "utf-8" else self.encode(encoding)
+        return collect(TokenStream(code, self.names, encoding), self.spans(code, lexer=lexer))
+
+    def spans(self, code, pos=0, end=None, lexer=None):
+        """
+        (kind, start, end) of every token of code[pos:end], every way of lexing goes through here
+
+        lexer is the patterns, the whitespace and the keyword tables to lex with, bytes need the binary ones
+        """
+        pattern, terminal_pattern, whitespace, words = lexer or (
+            self.pattern, self.terminal_pattern, self.whitespace, self.words)
+        match = pattern.match
+        longer = terminal_pattern.match if terminal_pattern is not None else None
+        skip = whitespace.match
+        groups = self.groups
+        ignorable = self.kinds.get("IGNORABLE")
+
+        end = len(code) if end is None else end
+        while pos < end:
+            found = match(code, pos, end)
+            if found is None or found.end() == pos:
+                raise RuntimeError("Couldn't match token on {}".format(rest(code, pos, end)))
+
+            # a keyword of the trie is taken unless a terminal matches more
+            if found.lastgroup == "_0" and longer is not None:
+                terminal = longer(code, pos, end)
+                if terminal is not None and terminal.end() > found.end():
+                    found = terminal
+
+            name = found.lastgroup
+            kind = groups[name]
+            if name in words:
+                kind = words[name].get(found.group(name), kind)
+            stop = found.end()
+            if kind != ignorable:
+                yield kind, pos, stop
+            pos = skip(code, stop, end).end()
+
+    def tokenize_iter(self, source, chunk_size=1 << 16):
+        """
+        yield tokens from a string, a file object or an iterable of chunks
+
+        the buffer is lexed as every chunk comes in and its last token, which may go on in the next chunk,
+        is lexed again with that chunk, so the buffer holds a chunk and one token,
+        a tail that does not lex is kept too unless it is longer than a chunk, '1.' may lex once '5' comes
+        """
+        if isinstance(source, str):
+            chunks = (source,)
+        elif hasattr(source, "read"):
+            chunks = iter(lambda: source.read(chunk_size), "")
+        else:
+            chunks = source
+
+        yield Token("SOF", "SOF", SOF)
+
+        names = self.names
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            last = None
+            try:
+                for span in self.spans(buffer):
+                    if last is not None:
+                        kind, start, stop = last
+                        yield Token(names[kind], buffer[start:stop], kind)
+                    last = span
+                keep = last[1] if last is not None else len(buffer)
+            except RuntimeError:
+                keep = last[1] if last is not None else 0
+                if len(buffer) - keep > max(chunk_size, len(chunk)):
+                    raise
+            buffer = buffer[keep:]
+
+        yield from self.scan(buffer, len(buffer))
+        yield Token("EOF", None, EOF)
+
+    def scan(self, code, end):
+        """
+        tokens of code[:end]
+        """
+        names = self.names
+        for kind, start, stop in self.spans(code, 0, end):
+            yield Token(names[kind], code[start:stop], kind)
+
+
+def collect(stream, spans):
+    """
+    the stream with SOF, the tokens of spans and EOF
+    """
+    kinds, starts, ends = stream.kinds, stream.starts, stream.ends
+    stream.append(SOF, 0, 0)
+    for kind, start, end in spans:
+        kinds.append(kind)
+        starts.append(start)
+        ends.append(end)
+
+    end = len(stream.source)
+    stream.append(EOF, end, end)
+    return stream
+
+
+def rest(code, pos, end):
+    """
+    the code left at pos for an error message, a mapped file is cut short and decoded
+    """
+    if isinstance(code, str):
+        return code[pos:end]
+    return str(code[pos:min(end, pos + 80)], "utf-8", "replace")
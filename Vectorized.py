@@ -0,0 +1,183 @@
+"""
+vectorized execution, the Interpreter's resolved tree runs on NumPy arrays of many inputs at once:
+
+    namespace = Vectorizer().load(program)
+    namespace['funkceG'](numpy.arange(-5, 40))
+
+    Vectorizer().load("r ← 58 − 4·x;", {'x': numpy.arange(10 ** 6)})['r']
+
+arithmetic and comparisons apply to whole arrays, a test gives a boolean mask
+and the branch or loop body it guards runs on the lanes the mask selects only,
+so a recursive call goes on with fewer lanes until none is left
+"""
+import numpy
+
+from Interpreter import Interpreter, Not, And, Or, Compare, If, While, unset
+
+
+def vector(value):
+    return isinstance(value, numpy.ndarray) and value.ndim > 0
+
+
+def select(frame, mask):
+    """
+    the frame cut down to the lanes of mask
+    """
+    return [value[mask] if vector(value) else value for value in frame]
+
+
+def masked(run, frame, mask):
+    """
+    run on the lanes of mask, the values they got are put back into the frame's arrays
+    """
+    if not mask.any():
+        return
+    if mask.all():
+        run(frame)
+        return
+
+    lanes = select(frame, mask)
+    taken = list(lanes)
+    run(lanes)
+
+    for slot, (value, before) in enumerate(zip(lanes, taken)):
+        if value is before or value is unset:
+            continue
+
+        # lanes outside the mask keep the old value, a variable they never had is zero there
+        old = frame[slot]
+        if old is unset:
+            merged = numpy.zeros(mask.shape, dtype=numpy.result_type(value))
+        else:
+            merged = numpy.array(numpy.broadcast_to(old, mask.shape), dtype=numpy.result_type(old, value))
+        merged[mask] = value
+        frame[slot] = merged
+
+
+def decide(value, operand, frame, undecided):
+    """
+    value with the operand's on the undecided lanes, the operand runs on those lanes only
+    as the scalar and and or do not run it once they know the result
+    """
+    if not undecided.any():
+        return value
+    if undecided.all():
+        return operand(frame)
+
+    right = operand(select(frame, undecided))
+    merged = numpy.array(value, dtype=numpy.result_type(value, right))
+    merged[undecided] = right
+    return merged
+
+
+class VectorNot(Not):
+    __slots__ = ()
+
+    def __call__(self, frame):
+        value = self.operand(frame)
+        if vector(value):
+            return numpy.logical_not(value)
+        return not value
+
+
+class VectorAnd(And):
+    """
+    lane by lane the first false operand or the last one, as the scalar and gives
+    """
+    __slots__ = ()
+
+    def __call__(self, frame):
+        value = self.operands[0](frame)
+        for operand in self.operands[1:]:
+            if vector(value):
+                value = decide(value, operand, frame, value.astype(bool))
+            elif value:
+                value = operand(frame)
+            else:
+                return value
+        return value
+
+
+class VectorOr(Or):
+    __slots__ = ()
+
+    def __call__(self, frame):
+        value = self.operands[0](frame)
+        for operand in self.operands[1:]:
+            if vector(value):
+                value = decide(value, operand, frame, ~value.astype(bool))
+            elif not value:
+                value = operand(frame)
+            else:
+                return value
+        return value
+
+
+class VectorCompare(Compare):
+    __slots__ = ()
+
+    def __call__(self, frame):
+        left = self.operands[0](frame)
+        result = True
+        for compare, operand in zip(self.operators, self.operands[1:]):
+            right = operand(frame)
+            result = numpy.logical_and(result, compare(left, right))
+            left = right
+        return result if vector(result) else bool(result)
+
+
+class VectorIf(If):
+    """
+    the first branch runs on the lanes its test holds for, the next one on the rest of them
+    """
+    __slots__ = ()
+
+    def __call__(self, frame):
+        self.branch(frame, 0)
+
+    def branch(self, frame, index):
+        if index == len(self.branches):
+            if self.otherwise is not None:
+                self.otherwise(frame)
+            return
+
+        test, body = self.branches[index]
+        mask = test(frame)
+        if not vector(mask):
+            if mask:
+                body(frame)
+            else:
+                self.branch(frame, index + 1)
+            return
+
+        mask = mask.astype(bool)
+        masked(body, frame, mask)
+        masked(lambda lanes: self.branch(lanes, index + 1), frame, ~mask)
+
+
+class VectorWhile(While):
+    """
+    the body runs on the lanes whose test still holds, until it holds for none
+    """
+    __slots__ = ()
+
+    def __call__(self, frame):
+        test, body = self.test, self.body
+        while True:
+            mask = test(frame)
+            if not vector(mask):
+                if not mask:
+                    return
+                body(frame)
+            else:
+                masked(body, frame, mask.astype(bool))
+                if not mask.any():
+                    return
+
+
+class Vectorizer(Interpreter):
+    """
+    an Interpreter whose tests and control flow work on arrays lane by lane
+    """
+
+    Not, And, Or, Compare, If, While = VectorNot, VectorAnd, VectorOr, VectorCompare, VectorIf, VectorWhile
@@ -0,0 +1,13 @@
+from Batch import parse_batch
+
+
+def test_programs_written_under_one_name_are_an_error(tmp_path):
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "p.pseu").write_text("x ← 1;", encoding="utf-8")
+    paths = [str(tmp_path / "a" / "p.pseu"), str(tmp_path / "b" / "p.pseu"), ("p.pseu", "y ← 2;")]
+
+    results = sorted(parse_batch(paths, out_dir=str(tmp_path / "out"), workers=1), key=lambda result: result.error or "")
+    assert [result.error for result in results[:1]] == [None]
+    assert all(result.error.startswith("FileExistsError") for result in results[1:]) and len(results) == 3
+    assert [path.name for path in (tmp_path / "out").iterdir()] == ["p.pseu.xml"]
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from Generator import Generator, PRIME, compiled
+from Interpreter import Interpreter
+from Samples import arithmetic, condition, funkce, loop, modes
+
+
+def generated(code, namespace=None, expressions="rules"):
+    namespace = Generator(expressions=expressions, cache_dir=None).load(code, namespace)
+    namespace.pop("__builtins__", None)
+    return namespace
+
+
+def test_numbers_read_as_the_interpreter_reads_them():
+    code = "r = 007; q = 0.50; z = .5;"
+    assert generated(code) == Interpreter().load(code) == {"r": 7, "q": 0.5, "z": 0.5}
+
+
+def test_python_keywords_stay_apart_from_names():
+    assert generated("lambda_ = 1; lambda = 2;") == {"lambda_": 1, "lambda" + PRIME: 2}
+
+
+def test_a_program_is_compiled_for_its_mode_and_file():
+    rules, flat = Generator(cache_dir=None), Generator(expressions="flat", cache_dir=None)
+    assert rules.compile("r ← (1);") is not flat.compile("r ← (1);")
+    assert rules.compile("r ← 1;", "a.pseu").co_filename == "a.pseu"
+    assert rules.compile("r ← 1;", "b.pseu").co_filename == "b.pseu"
+
+
+def test_the_caches_keep_their_limits(tmp_path):
+    generator = Generator(cache_dir=str(tmp_path), max_entries=2, max_disk_bytes=300)
+    for value in range(6):
+        assert generator.load("r ← {value} * x;".format(value=value), {"x": 2})["r"] == value * 2
+    assert len(compiled) <= 2
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 300
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_a_generated_function_returns_what_the_interpreter_does(expressions):
+    interpreted = Interpreter(expressions=expressions).load(funkce)["funkceG"]
+    function = generated(funkce, expressions=expressions)["funkceG"]
+    assert [function(x) for x in range(-5, 40)] == [interpreted(x) for x in range(-5, 40)]
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_a_generated_loop_leaves_what_the_interpreter_does(expressions):
+    assert generated(loop, expressions=expressions) == Interpreter(expressions=expressions).load(loop)
+
+
+def programs(count, seed=18):
+    generator = random.Random(seed)
+    for index in range(count):
+        if index % 2:
+            yield "r ← {value};".format(value=arithmetic(generator, 4))
+        else:
+            yield "if {test} then r ← 1; else r ← 0; fi".format(test=condition(generator, 3))
+
+
+def result(load, code):
+    """
+    r after running code, the name of the exception it raised otherwise
+    """
+    try:
+        return load(code, {"x": 3, "y": 2, "f": lambda value: value * 2 + 1}).get("r")
+    except Exception as error:
+        return type(error).__name__
+
+
+@pytest.mark.parametrize("code", list(programs(400)))
+@pytest.mark.parametrize("expressions", modes)
+def test_a_generated_expression_evaluates_as_the_interpreter_does(code, expressions):
+    expected = result(Interpreter(expressions=expressions).load, code)
+    actual = result(lambda code, namespace: generated(code, namespace, expressions), code)
+    assert actual == expected or (actual != actual and expected != expected)
@@ -0,0 +1,183 @@
+import random
+
+import pytest
+
+import Benchmark
+import Grammar
+from main import program
+from Incremental import Document, Text
+from Parser import Parser, ParseError
+from Pseudocode import grammar
+
+
+def failure(error):
+    if isinstance(error, ParseError):
+        return error.position, sorted(error.expected)
+    return type(error).__name__
+
+
+def full(text):
+    return Parser(grammar).parse(Grammar.load(grammar).tokenizer.tokenize_stream(text))
+
+
+def parsed(text):
+    try:
+        return repr(full(text))
+    except (ParseError, RuntimeError) as error:
+        return failure(error)
+
+
+def edited(document, offset, deleted, inserted):
+    ast = document.edit(offset, deleted, inserted)
+    return repr(ast) if ast is not None else failure(document.error)
+
+
+nested = """
+while x > 0 then
+if y then
+while z then
+q ← q * 2;
+done
+r ← 1;
+elif w then
+if v then
+s ← 2;
+fi
+t ← 3;
+else
+if u then
+p ← 1;
+fi
+o ← 4;
+fi
+x ← x − 1;
+done
+"""
+
+pieces = ["x", "1", " ", ";", "y ← 2;", "if x < 1 then", " fi", "done", "while y then z; ", "+", "(", ")", "f(",
+          "\n", "else", "elif", "q ← q * 2;", "not ", " and ", "z ← z + 1;\n", "if y then z ← 1; fi ", "7"]
+
+
+def valid(generator, text):
+    """
+    an edit keeping the text a program, a statement inserted or removed at an unindented line start
+    or a digit changed, a suite starts with a compound statement
+    """
+    lines = [index + 1 for index, character in enumerate(text[:-1]) if character == "\n" and text[index + 1] != " "]
+    choice = generator.randrange(4)
+    if choice == 0:
+        return generator.choice(lines), 0, "if y then z ← 1; fi\n"
+    if choice == 1:
+        lines = [line for line in lines if not text[:line].endswith(("then\n", "else\n"))]
+        return generator.choice(lines), 0, "print(q);\n"
+    if choice == 2:
+        offset = generator.choice(lines)
+        for inserted in ("if y then z ← 1; fi\n", "print(q);\n"):
+            if text.startswith(inserted, offset):
+                return offset, len(inserted), ""
+        return offset, 0, ""
+    digits = [index for index, character in enumerate(text) if character.isdigit()]
+    return generator.choice(digits), 1, str(generator.randrange(10))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_an_edit_parses_as_the_whole_text_does(seed):
+    generator = random.Random(seed)
+    text = Benchmark.statements(40)[0] + nested + program
+    # short pieces for the edits and the lexing to cross
+    document = Document(grammar, text, size=32)
+    incremental = 0
+
+    for _ in range(40):
+        if generator.random() < 0.5:
+            steps = [valid(generator, text)]
+        else:
+            # a random edit mostly breaks the program, it is undone by the edit after it
+            offset = generator.randrange(len(text) + 1)
+            deleted = min(generator.choice([0, 0, 1, 2, 5, 12]), len(text) - offset)
+            inserted = generator.choice(pieces)
+            steps = [(offset, deleted, inserted), (offset, len(inserted), text[offset:offset + deleted])]
+
+        for offset, deleted, inserted in steps:
+            text = text[:offset] + inserted + text[offset + deleted:]
+            expected = parsed(text)
+            assert edited(document, offset, deleted, inserted) == expected
+            assert document.text == text
+            if isinstance(expected, str) and document.reparsed < len(document.tokens):
+                incremental += 1
+
+    assert incremental > 10
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_a_text_is_edited_as_a_string_is(seed):
+    generator = random.Random(seed)
+    text = Benchmark.statements(20)[0]
+    source = Text(text, 16)
+    for _ in range(200):
+        offset = generator.randrange(len(text) + 1)
+        deleted = min(generator.choice([0, 1, 5, 20, 100]), len(text) - offset)
+        inserted = generator.choice(["", "x", "←", "if y then z ← 1; fi\n" * generator.randrange(4)])
+        text = text[:offset] + inserted + text[offset + deleted:]
+        source.replace(offset, deleted, inserted)
+
+        start = generator.randrange(len(text) + 1)
+        stop = generator.randrange(start, len(text) + 1)
+        assert (str(source), len(source), source[start:stop]) == (text, len(text), text[start:stop])
+
+
+def statement(document, marker, after=""):
+    start = document.text.index(marker)
+    return document.text.index(after, start) if after else start
+
+
+edits = [
+    ("change a number", lambda document: (statement(document, "x100 ← a100") + len("x100 ← a100 * "), 3, "7")),
+    ("insert a statement", lambda document: (statement(document, "print(x101)", "\n") + 1, 0, "z ← z + 1;\n")),
+    ("delete a statement", lambda document: (
+        statement(document, "x104 ← a104"), len("x104 ← a104 * 104 + b − 3;\n"), "")),
+    ("edit inside an if", lambda document: (statement(document, "if x102", "y ← y + 1;") + 8, 1, "5")),
+    ("nest a statement", lambda document: (
+        statement(document, "if x110", "y ← y + 1;"), 10, "if y then z ← 1; fi y ← y + 1;")),
+    ("edit the nested statement", lambda document: (statement(document, "if x110", "z ← 1") + 4, 1, "7")),
+    ("rename", lambda document: (statement(document, "x108 ← a108"), 4, "foo")),
+    ("grow the first branch", lambda document: (statement(document, "r ← 1;"), 0, "r ← r + 2 * y;\n")),
+    ("edit the elif branch", lambda document: (statement(document, "t ← 3;"), 6, "t ← t − 3;")),
+    ("edit the else branch", lambda document: (statement(document, "o ← 4;"), 6, "o ← (o);")),
+    ("edit after the loop", lambda document: (statement(document, "x ← x − 1;"), 10, "x ← x − 2 · 1;")),
+]
+
+
+def test_small_edits_reparse_a_few_tokens():
+    document = Document(grammar, Benchmark.statements(200)[0] + nested + Benchmark.statements(200)[0])
+    for name, edit in edits:
+        ast = document.edit(*edit(document))
+        assert repr(ast) == repr(full(document.text)), name
+        assert document.reparsed < len(document.tokens) // 10, name
+
+
+def test_a_document_keeps_a_text_that_does_not_parse():
+    document = Document(grammar, "x ← 1; if x then y; z ← 2;")
+    assert document.ast is None and isinstance(document.error, ParseError)
+
+    ast = document.edit(len("x ← 1; if x then y;"), 0, " fi")
+    assert document.error is None and repr(ast) == repr(full(document.text))
+
+    assert document.edit(0, 0, "$") is None and isinstance(document.error, RuntimeError)
+    assert repr(document.edit(0, 1, "")) == repr(full(document.text))
+
+
+def test_an_edit_leaves_what_is_after_it_alone():
+    document = Document(grammar, Benchmark.statements(2000)[0])
+    middle = document.text.index("x1000 ←")
+    document.edit(middle, 0, "z ← 1;\n")
+
+    tokens, source, block = document.tokens, document.source, document.blocks[0]
+    stored = tokens.starts[-1], source.starts[-1], block.statements[-1].start
+    for _ in range(10):
+        ast = document.edit(middle, 0, "z ← 1;\n")
+
+    assert document.tokens is tokens and document.blocks[0] is block
+    assert (tokens.starts[-1], source.starts[-1], block.statements[-1].start) == stored
+    assert tokens.end(len(tokens) - 2) == len(document.text.rstrip())
+    assert repr(ast) == repr(full(document.text))
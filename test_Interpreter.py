@@ -0,0 +1,66 @@
+import pytest
+
+from Generator import Generator
+from Interpreter import Interpreter
+from Samples import funkce, loop, modes
+
+
+def funkceG(x):
+    if x < 0:
+        x = 0
+    if x < 14:
+        r = funkceG(58 - 4 * x) - 9
+    else:
+        r = 39
+    return r
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_a_function_returns_what_python_does(expressions):
+    function = Interpreter(expressions=expressions).load(funkce)["funkceG"]
+    assert [function(x) for x in range(-5, 40)] == [funkceG(x) for x in range(-5, 40)]
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_a_loop_leaves_what_python_does(expressions):
+    a, b, s, n = 1, 2.5, "hi", 0
+    while a < 10 and b != 3:
+        if a // 2 * 2 != a:
+            b = b ** 2 ** 1 % 7
+        elif not a > 3:
+            n = n + 1
+        else:
+            t = (a - 1) * (b + 2)
+        a = a + 1
+    assert Interpreter(expressions=expressions).load(loop) == {"a": a, "b": b, "s": s, "n": n, "t": t}
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_constant_operands_are_folded(expressions):
+    interpreter = Interpreter(expressions=expressions)
+    resolved = repr(interpreter.resolve(interpreter.parse("r ← 2 * 3 + x · 3 ** 2 * (4 − 1); q ← 2 ** 100;")))
+    assert "Constant(6)" in resolved and "Constant(9)" in resolved and "Constant(3)" in resolved
+    assert "Binary(pow, Constant(2), Constant(100))" in resolved
+    assert interpreter.load("r ← 2 * 3 + x · 3 ** 2 * (4 − 1); q ← 2 ** 100;", {"x": 2}) == {
+        "x": 2, "r": 60, "q": 2 ** 100}
+
+
+def test_a_folded_error_is_raised_when_it_runs():
+    assert Interpreter().load("if x then r ← 1 / 0; fi", {"x": False}) == {"x": False}
+    with pytest.raises(ZeroDivisionError):
+        Interpreter().load("if x then r ← 1 / 0; fi", {"x": True})
+
+
+@pytest.mark.parametrize("code", ['s ← "ab" * 10 ** 8;', "s ← 10 ** 10 ** 8;", 's ← "ab" * 5000 + "ab" * 5000;'])
+def test_a_large_constant_is_left_to_run(code):
+    interpreter = Interpreter()
+    resolved = repr(interpreter.resolve(interpreter.parse("if x then {code} fi".format(code=code))))
+    assert "Binary(" in resolved
+    assert interpreter.load("if x then {code} fi".format(code=code), {"x": False}) == {"x": False}
+
+
+def test_a_function_reads_the_names_it_does_not_assign():
+    code = "FUNCTION f(x): r ← x + y; RETURN r;"
+    assert Interpreter().load(code, {"y": 1})["f"](2) == Generator(cache_dir=None).load(code, {"y": 1})["f"](2) == 3
+    with pytest.raises(NameError):
+        Interpreter().load(code)["f"](2)
@@ -0,0 +1,149 @@
+import random
+from xml.etree.ElementTree import tostring
+
+import pytest
+
+import Benchmark
+import Grammar
+from AST import Node, ElementBuilder
+from main import program
+from EBNF import EBNF
+from Parser import Parser, ParseError
+from Pseudocode import grammar
+from Samples import arithmetic, atoms, condition
+
+
+engines = [
+    {},
+    {"expressions": "precedence"},
+    {"expressions": "flat"},
+    {"iterative": True},
+]
+
+
+def parse(code, **options):
+    return Parser(grammar, **options).parse(Grammar.load(grammar).tokenizer.tokenize_stream(code))
+
+
+@pytest.mark.parametrize("options", engines)
+@pytest.mark.parametrize("code, position", [
+    ("x = 1; y = x +; z = 3;", 9),
+    ("r = 0; while x > 0 then x = x - 1; r = r + 2; done", 16),
+    ("x = = 2;", 3),
+])
+def test_a_tail_that_does_not_parse_is_an_error(code, position, options):
+    with pytest.raises(ParseError) as error:
+        parse(code, **options)
+    assert error.value.position == position
+
+
+@pytest.mark.parametrize("code", ["x = 1; y = x +; z = 3;", "x = = 2;"])
+def test_the_machine_requires_eof(code):
+    with pytest.raises(ParseError):
+        EBNF(grammar).parse(Grammar.load(grammar).tokenizer.tokenize(code))
+
+
+repetitions = """
+S: A ([B])* C
+A: x
+B: y
+C: z
+IGNORABLE: \\s+
+"""
+
+
+@pytest.mark.parametrize("rules", [repetitions, repetitions.replace("([B])*", "([B])+")])
+@pytest.mark.parametrize("code", ["x z", "x y y z"])
+def test_a_repetition_that_matches_nothing_ends(rules, code):
+    tokenizer = Grammar.load(rules).tokenizer
+    trees = [
+        EBNF(rules).parse(tokenizer.tokenize(code)),
+        Parser(rules).parse(tokenizer.tokenize_stream(code)),
+        Parser(rules, iterative=True).parse(tokenizer.tokenize_stream(code)),
+    ]
+    assert trees[0].children[0] == "x" and trees[0].children[-1] == "z"
+    assert repr(trees[0]) == repr(trees[1]) == repr(trees[2])
+
+
+@pytest.mark.parametrize("rules", [repetitions.replace("S: A", "S: A ?"), repetitions.replace("C\nA", "C !\nA")])
+def test_a_rule_with_text_that_is_no_symbol_is_an_error(rules):
+    with pytest.raises(SyntaxError, match="Unexpected"):
+        EBNF(rules)
+
+
+# --- [ Iterative ] --- #
+
+shallow = [
+    program,
+    "x ← ((((((((1+2)*3)-4)))))) ;",
+    "r ← f(1) + g(2) - 3 ** 2 ** 2;",
+    "while not a and b or c then x = x - 1; done",
+    "FUNCTION f(a, b, c): x = 1; RETURN;",
+    "if not not x < 1 and y or z then r ← f(a*b) * 2; elif x == 2 then r ← 3; else r ← 4; fi",
+    "r ← 2 ** (3 + 4) ** x * -1;",
+] + [code for generate, sizes in Benchmark.generators.values() for code in generate(sizes[0])]
+
+broken = ["x ← ;", "if x then", "x ← 1", "while x then y; fi", "FUNCTION f(: x;", "x ← (1 + ;", "print(1;", "", "fi",
+          "x ← not;", "x ← 1 ** ;", "f(2) * 3;"]
+
+
+def outcome(code, **options):
+    try:
+        ast = parse(code, **options)
+    except ParseError as error:
+        return error.position, sorted(error.expected)
+    return repr(ast) if isinstance(ast, Node) else tostring(ast)
+
+
+@pytest.mark.parametrize("code", shallow + broken)
+def test_the_machine_agrees_with_the_recursive_parser(code):
+    assert outcome(code, iterative=True) == outcome(code)
+
+
+def depth(ast):
+    deepest, stack = 0, [(ast, 1)]
+    while stack:
+        node, level = stack.pop()
+        deepest = max(deepest, level)
+        if isinstance(node, Node):
+            stack.extend((child, level + 1) for child in node.children)
+    return deepest
+
+
+@pytest.mark.parametrize("code", [
+    "r ← " + "(" * 5000 + "x" + ")" * 5000 + ";",
+    "if x then " * 5000 + "y;" + " fi" * 5000,
+    "while x then " * 5000 + "y;" + " done" * 5000,
+    "r ← " + "x ** " * 5000 + "2;",
+])
+def test_the_machine_parses_thousands_of_levels(code):
+    assert depth(parse(code, iterative=True)) > 5000
+    assert isinstance(parse(code, iterative=True, builder=ElementBuilder()).tag, str)
+
+
+# --- [ Precedence ] --- #
+
+# the parser takes any atom, strings and None too
+values = atoms + ["'s'", "None"]
+
+
+def expressions(count, seed=14):
+    generator = random.Random(seed)
+    return ["if {condition} then r ← {value}; fi".format(
+        condition=condition(generator, 3, values), value=arithmetic(generator, 3, values)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("code", shallow + broken + expressions(300))
+@pytest.mark.parametrize("options", [{}, {"memoize": True}, {"builder": ElementBuilder()}])
+def test_the_precedence_engine_builds_the_rules_tree(code, options):
+    assert outcome(code, expressions="precedence", **options) == outcome(code, **options)
+
+
+@pytest.mark.parametrize("code", broken + ["x ← f(2 ;", "if x < then y; fi", "r ← (a + b;"])
+def test_every_expression_engine_reports_the_same_error(code):
+    assert outcome(code, expressions="flat") == outcome(code, expressions="precedence") == outcome(code)
+
+
+def test_the_flat_tree_keeps_operators_and_operands():
+    ast = parse("r ← f(a) + 2 * (b − 1);", expressions="flat")
+    assert "Node(expr, [Node(call, ['f', 'a']), '+', Node(term, ['2', '*', Node(expr, ['b', '−', '1'])])])" in repr(ast)
@@ -0,0 +1,53 @@
+from itertools import islice, repeat
+
+import pytest
+
+from Pseudocode import grammar
+from Tokenizer import Tokenizer
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    return Tokenizer(grammar)
+
+
+def lexed(tokenizer, code):
+    return [(token.type, token.value) for token in tokenizer.tokenize(code)][1:-1]
+
+
+@pytest.mark.parametrize("operator", ["==", "<=", "!=", ">=", "<>"])
+def test_comparison_operators_are_compop(tokenizer, operator):
+    assert lexed(tokenizer, f"x {operator} 3") == [("NAME", "x"), ("COMPOP", operator), ("NUMBER", "3")]
+
+
+def test_single_equals_is_the_keyword(tokenizer):
+    assert lexed(tokenizer, "x = 1;") == [("NAME", "x"), ("KEYWORD", "="), ("NUMBER", "1"), ("KEYWORD", ";")]
+
+
+def test_keywords_do_not_cut_names(tokenizer):
+    assert lexed(tokenizer, "if iffy if_ if2 fi") == [
+        ("KEYWORD", "if"), ("NAME", "iffy"), ("NAME", "if_"), ("NAME", "if2"), ("KEYWORD", "fi")]
+
+
+def test_every_way_of_lexing_agrees(tokenizer, tmp_path):
+    code = "FUNCTION f(x):\n  if x == 3 then y ← x·2 − 1; fi\n  RETURN y;"
+    expected = [(token.type, token.value, token.kind) for token in tokenizer.tokenize(code)]
+
+    path = tmp_path / "program.pseu"
+    path.write_text(code, encoding="utf-8")
+    chunks = [code[index:index + 5] for index in range(0, len(code), 5)]
+
+    for tokens in (tokenizer.tokenize_stream(code), tokenizer.tokenize_file(path), tokenizer.tokenize_iter(chunks)):
+        assert [(token.type, token.value, token.kind) for token in tokens] == expected
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_chunks_cut_anywhere_lex_as_the_whole_code(tokenizer, size):
+    code = "x←1.5;y==3;r←f(x)−2;if x<>y then z←'s';fi" * 3
+    chunks = [code[index:index + size] for index in range(0, len(code), size)]
+    assert [(token.type, token.value) for token in tokenizer.tokenize_iter(chunks)][1:-1] == lexed(tokenizer, code)
+
+
+def test_endless_chunks_are_lexed_as_they_come(tokenizer):
+    tokens = islice(tokenizer.tokenize_iter(repeat("x←1;")), 1, 9)
+    assert [token.value for token in tokens] == ["x", "←", "1", ";"] * 2
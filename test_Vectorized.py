@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from Interpreter import Interpreter
+from Samples import arithmetic, condition, funkce, modes
+from Vectorized import Vectorizer
+
+
+@pytest.mark.parametrize("code", [
+    "FUNCTION g(x): if x > 0 and g(x − 1) > 0 then r ← 1; else r ← 0; fi RETURN r + 1;",
+    "FUNCTION g(x): if x < 1 or g(x − 1) > 5 then r ← 1; else r ← 0; fi RETURN r + 1;",
+])
+def test_and_or_skip_the_lanes_they_decided(code):
+    inputs = numpy.arange(-3, 8)
+    expected = [Interpreter().load(code)['g'](int(x)) for x in inputs]
+    assert Vectorizer().load(code)['g'](inputs).tolist() == expected
+
+
+@pytest.mark.parametrize("expressions", modes)
+def test_a_function_runs_every_lane_as_the_interpreter_does(expressions):
+    inputs = numpy.arange(-50, 50)
+    interpreted = Interpreter(expressions=expressions).load(funkce)["funkceG"]
+    vectorized = Vectorizer(expressions=expressions).load(funkce)["funkceG"]
+    assert vectorized(inputs).tolist() == [interpreted(int(x)) for x in inputs]
+    assert vectorized(5) == interpreted(5)
+
+
+# the lanes are int64, a division or a power would leave them
+values = ["x", "y", "2", "3", "0", "1.5"]
+lanes = ["+", "−", "*"]
+
+
+def programs(count, seed=20):
+    generator = random.Random(seed)
+    # the step is added on every pass, a deeper one would outgrow the int64 lanes
+    template = ("n ← 0; while x > 0 and n < 5 then if {first} then y ← y + {step}; elif {second} then z ← {value}; "
+                "else y ← y − 1; fi x ← x − 1; n ← n + 1; done r ← y + n;")
+    return [template.format(first=condition(generator, 3, values, lanes), step=arithmetic(generator, 1, values, lanes),
+                             second=condition(generator, 2, values, lanes), value=arithmetic(generator, 2, values, lanes))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("code", programs(60))
+def test_every_lane_ends_as_the_interpreter_does(code):
+    xs, ys = numpy.arange(-3, 12), numpy.arange(15) % 4 - 1
+    lanes = Vectorizer().load(code, {"x": xs.copy(), "y": ys.copy()})
+    for lane, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+        expected = Interpreter().load(code, {"x": x, "y": y})
+        for name, value in expected.items():
+            assert float(lanes[name][lane] if numpy.ndim(lanes[name]) else lanes[name]) == float(value), (lane, name)